@@ -0,0 +1,3 @@
+"""
+Offline embedding benchmarks, see docs/benchmarks.md.
+"""
@@ -0,0 +1,48 @@
+"""
+Fixed synthetic corpora, the same seed produces the same documents on every machine and version.
+"""
+
+import random
+from typing import Dict, List, Tuple
+
+# common English words, so that tokenizers and vocabularies of real models see realistic tokens
+_WORDS = """
+the of and to in is was for that on as with by he at from his an were are which this be or has had not first one
+their its new after who they have her she two been other when there all during into school time may years more most
+only over city some world would where later up such used many can state about national out known university united
+then made also team three him game season both part film series music include american year well however under
+between people life since album early called while first because high through group number before second area made
+war these each found water system released book line based family following government public set work house name
+several day back now following around world river building company day four history large received south north east
+west led held main station became group end local even point members under long field small general former until
+power name town age population known country still part single court law known development human early data model
+search query document answer question language learning network machine vector database embedding index cluster
+""".split()
+
+# (minimum words, maximum words) per document of every corpus
+CORPORA: Dict[str, Tuple[int, int]] = {
+    "queries": (4, 12),
+    "passages": (60, 140),
+    "documents": (300, 600),
+}
+
+
+def generate_corpus(name: str, size: int, seed: int = 42) -> List[str]:
+    """
+    Generate `size` documents of the named corpus (see `CORPORA`).
+
+    :param name: The name of the corpus, one of "queries", "passages" and "documents".
+    :param size: The number of documents.
+    :param seed: The seed of the generator. Default is 42.
+    :return: The documents.
+    """
+    if name not in CORPORA:
+        raise ValueError(f"Unknown corpus {name}, expected one of {', '.join(CORPORA)}")
+    rng = random.Random(f"{name}-{seed}")
+    min_words, max_words = CORPORA[name]
+    documents = []
+    for _ in range(size):
+        words = rng.choices(_WORDS, k=rng.randint(min_words, max_words))
+        words[0] = words[0].capitalize()
+        documents.append(f"{' '.join(words)}.")
+    return documents
@@ -0,0 +1,318 @@
+"""
+Embedding throughput and latency benchmarks.
+
+Remote embedding functions run against the local provider stubs of `benchmarks.stubs`, local embedding functions
+run on the machine. Every benchmark runs in a fresh process so that its peak RSS is not shared with the others.
+
+Usage:
+    python -m benchmarks.run --corpus passages --num-docs 2000 --latency 0.05 --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction
+
+from benchmarks.corpus import CORPORA, generate_corpus
+from benchmarks.stubs import StubConfig, StubServer
+from chromadbx.core.ratelimit import estimate_batch_tokens
+
+_Factory = Callable[[argparse.Namespace, str], EmbeddingFunction[Documents]]
+
+
+def _nomic(args: argparse.Namespace, url: str) -> EmbeddingFunction[Documents]:
+    from chromadbx.embeddings.nomic import NomicEmbeddingFunction
+
+    return NomicEmbeddingFunction(
+        api_key="stub",
+        api_url=f"{url}/nomic/v1/embedding/text",
+        dimensionality=args.dimensions,
+    )
+
+
+def _cloudflare(args: argparse.Namespace, url: str) -> EmbeddingFunction[Documents]:
+    from chromadbx.embeddings.cloudflare import CloudflareWorkersAIEmbeddings
+
+    return CloudflareWorkersAIEmbeddings(
+        api_token="stub", gateway_endpoint=f"{url}/cloudflare/"
+    )
+
+
+def _mistral(args: argparse.Namespace, url: str) -> EmbeddingFunction[Documents]:
+    from chromadbx.embeddings.mistral import MistralAIEmbeddings
+
+    return MistralAIEmbeddings(api_key="stub", server_url=f"{url}/mistral")
+
+
+def _together(args: argparse.Namespace, url: str) -> EmbeddingFunction[Documents]:
+    # the Together client reads its API key from the environment
+    os.environ.setdefault("TOGETHER_API_KEY", "stub")
+    from chromadbx.embeddings.together import TogetherEmbeddingFunction
+
+    return TogetherEmbeddingFunction(api_key="stub", base_url=f"{url}/together/v1")
+
+
+def _onnx(args: argparse.Namespace, url: str) -> EmbeddingFunction[Documents]:
+    from chromadbx.embeddings.onnx import OnnxRuntimeEmbeddings
+
+    kwargs = json.loads(args.onnx_kwargs)
+    kwargs.setdefault("hf_download", not os.path.isdir(args.onnx_model))
+    return OnnxRuntimeEmbeddings(model_path=args.onnx_model, **kwargs)
+
+
+def _spacy(args: argparse.Namespace, url: str) -> EmbeddingFunction[Documents]:
+    from chromadbx.embeddings.spacy import SpacyEmbeddingFunction
+
+    return SpacyEmbeddingFunction(model_name=args.spacy_model)
+
+
+def _llamacpp(args: argparse.Namespace, url: str) -> EmbeddingFunction[Documents]:
+    if not args.llamacpp_model:
+        raise ValueError("No model given, use --llamacpp-model")
+    from chromadbx.embeddings.llamacpp import LlamaCppEmbeddingFunction
+
+    return LlamaCppEmbeddingFunction(
+        model_path=args.llamacpp_model, hf_file_name=args.llamacpp_file
+    )
+
+
+BENCHMARKS: Dict[str, _Factory] = {
+    "nomic": _nomic,
+    "cloudflare": _cloudflare,
+    "mistral": _mistral,
+    "together": _together,
+    "onnx": _onnx,
+    "spacy": _spacy,
+    "llamacpp": _llamacpp,
+}
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_benchmark(name: str, args: argparse.Namespace, url: str) -> Dict[str, Any]:
+    """
+    Run one benchmark in the current process.
+
+    :param name: The name of the benchmark (see `BENCHMARKS`).
+    :param args: The parsed command line arguments.
+    :param url: The URL of the provider stubs.
+    :return: The results of the benchmark.
+    """
+    result: Dict[str, Any] = {"name": name}
+    start = time.perf_counter()
+    try:
+        ef = BENCHMARKS[name](args, url)
+    except Exception as e:
+        # missing optional packages and models are reported, not fatal
+        result["skipped"] = str(e)
+        return result
+    result["load_seconds"] = time.perf_counter() - start
+
+    documents = generate_corpus(args.corpus, args.num_docs, args.seed)
+    batches = [
+        documents[i : i + args.batch_size]
+        for i in range(0, len(documents), args.batch_size)
+    ]
+    errors: List[str] = []
+    warmup_failed_calls = 0
+    for batch in batches[: args.warmup]:
+        try:
+            ef(batch)
+        except Exception as e:
+            # e.g. a stub failure that outlasted the retries, like in the timed calls
+            errors.append(repr(e))
+            warmup_failed_calls += 1
+
+    latencies: List[float] = []
+    embedded: List[Documents] = []
+    lock = threading.Lock()
+
+    def embed(batch: Documents) -> None:
+        call_start = time.perf_counter()
+        try:
+            ef(batch)
+        except Exception as e:
+            with lock:
+                errors.append(repr(e))
+            return
+        latency = time.perf_counter() - call_start
+        with lock:
+            latencies.append(latency)
+            embedded.append(batch)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(embed, batches))
+    seconds = time.perf_counter() - start
+
+    docs = sum(len(batch) for batch in embedded)
+    tokens = sum(estimate_batch_tokens(batch) for batch in embedded)
+    p50, p95, p99 = (
+        np.percentile(np.array(latencies) * 1000, [50, 95, 99]).tolist()
+        if latencies
+        else [None] * 3
+    )
+    result.update(
+        {
+            "docs": docs,
+            "tokens": tokens,
+            "seconds": seconds,
+            "docs_per_sec": docs / seconds,
+            "tokens_per_sec": tokens / seconds,
+            "latency_ms": {
+                "p50": p50,
+                "p95": p95,
+                "p99": p99,
+                "mean": float(np.mean(latencies)) * 1000 if latencies else None,
+            },
+            "warmup_failed_calls": warmup_failed_calls,
+            "failed_calls": len(errors) - warmup_failed_calls,
+            "errors": sorted(set(errors))[:10],
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+    )
+    return result
+
+
+def _version() -> Dict[str, Optional[str]]:
+    try:
+        from importlib.metadata import version
+
+        package_version: Optional[str] = version("chromadbx")
+    except Exception:
+        package_version = None
+    try:
+        commit: Optional[str] = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    return {"version": package_version, "commit": commit}
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run the selected benchmarks, each in its own process, against a fresh provider stub server.
+    """
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        dimensions=args.dimensions,
+        seed=args.seed,
+    )
+    results = []
+    with StubServer(config) as server:
+        for name in args.benchmarks:
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=get_context("spawn")
+            ) as executor:
+                result = executor.submit(run_benchmark, name, args, server.url).result()
+            results.append(result)
+            print(_summary(result), file=sys.stderr)
+        stubs = {"requests": server.requests, "errors": server.errors}
+    return {
+        "chromadbx": _version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output",)
+        },
+        "stubs": stubs,
+        "results": results,
+    }
+
+
+def _summary(result: Dict[str, Any]) -> str:
+    if "skipped" in result:
+        return f"{result['name']:<12} skipped: {result['skipped']}"
+    latency = result["latency_ms"]
+    return (
+        f"{result['name']:<12} {result['docs_per_sec']:>10.1f} docs/s "
+        f"{result['tokens_per_sec']:>12.1f} tokens/s "
+        f"p50 {latency['p50'] or 0:>8.2f}ms p95 {latency['p95'] or 0:>8.2f}ms "
+        f"p99 {latency['p99'] or 0:>8.2f}ms rss {result['peak_rss_mb']:>8.1f}MB"
+    )
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--benchmarks",
+        type=lambda value: value.split(","),
+        default=list(BENCHMARKS),
+        help=f"Comma separated benchmarks to run, default: {','.join(BENCHMARKS)}",
+    )
+    parser.add_argument("--corpus", choices=list(CORPORA), default="passages")
+    parser.add_argument("--num-docs", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of threads calling the embedding function",
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=1, help="Number of untimed batches"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="Stub latency in seconds"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Random extra stub latency"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction of failed requests"
+    )
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--onnx-model", default="snowflake/arctic-embed-s")
+    parser.add_argument(
+        "--onnx-kwargs", default="{}", help="JSON keyword arguments for ONNX"
+    )
+    parser.add_argument("--spacy-model", default="en_core_web_md")
+    parser.add_argument("--llamacpp-model", default=None)
+    parser.add_argument("--llamacpp-file", default=None)
+    parser.add_argument("--output", default=None, help="JSON file, default stdout")
+    args = parser.parse_args(argv)
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parse_args(argv)
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
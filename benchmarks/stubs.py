@@ -0,0 +1,251 @@
+"""
+Local stand-ins for the embedding APIs of remote providers.
+
+Every provider is served under its own path prefix and answers with the response shape of the real API:
+
+    /nomic/v1/embedding/text                 Nomic
+    /cloudflare/<model>                      Cloudflare Workers AI (as an AI Gateway endpoint)
+    /mistral/v1/embeddings                   Mistral AI
+    /together/v1/embeddings                  Together
+
+Usage:
+    python -m benchmarks.stubs --port 8765 --latency 0.05 --error-rate 0.01
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class StubConfig:
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        dimensions: int = 768,
+        seed: Optional[int] = 0,
+    ):
+        """
+        :param latency: The time in seconds every request takes. Default is 0.
+        :param jitter: The maximum random time in seconds added to the latency. Default is 0.
+        :param error_rate: The fraction of requests that fail with a 429 or 503 response. Default is 0.
+        :param dimensions: The number of dimensions of the embeddings. Default is 768.
+        :param seed: The seed of the random failures. Default is 0, None for a random seed.
+        """
+        if not 0 <= error_rate <= 1:
+            raise ValueError("Error rate must be between 0 and 1")
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.dimensions = dimensions
+        self.random = random.Random(seed)
+
+
+# stands in for every embedding of a response, replaced by the cached JSON of the vector after encoding
+_EMBEDDING = "\x00embedding"
+
+
+@lru_cache(maxsize=None)
+def _vector_json(dimensions: int) -> str:
+    rng = np.random.default_rng(dimensions)
+    return json.dumps(rng.standard_normal(dimensions, dtype=np.float32).tolist())
+
+
+def _embeddings(texts: List[str]) -> List[str]:
+    return [_EMBEDDING] * len(texts)
+
+
+def _encode(payload: Dict[str, Any], dimensions: int) -> bytes:
+    # encoding thousands of floats per request would make the stub slower than the latency it simulates
+    return (
+        json.dumps(payload)
+        .replace(json.dumps(_EMBEDDING), _vector_json(dimensions))
+        .encode("utf-8")
+    )
+
+
+def _nomic(body: Dict[str, Any], dimensions: int) -> Dict[str, Any]:
+    texts = body["texts"]
+    tokens = sum(len(text.split()) for text in texts)
+    return {
+        "embeddings": _embeddings(texts),
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        "model": body.get("model"),
+        "inputs": None,
+    }
+
+
+def _cloudflare(body: Dict[str, Any], dimensions: int) -> Dict[str, Any]:
+    texts = body["text"] if isinstance(body["text"], list) else [body["text"]]
+    return {
+        "result": {
+            "shape": [len(texts), dimensions],
+            "data": _embeddings(texts),
+        },
+        "success": True,
+        "errors": [],
+        "messages": [],
+    }
+
+
+def _openai_like(texts: List[str], model: str) -> Dict[str, Any]:
+    tokens = sum(len(text.split()) for text in texts)
+    return {
+        "id": "stub",
+        "object": "list",
+        "model": model,
+        "data": [
+            {"object": "embedding", "embedding": embedding, "index": i}
+            for i, embedding in enumerate(_embeddings(texts))
+        ],
+        "usage": {
+            "prompt_tokens": tokens,
+            "total_tokens": tokens,
+            "completion_tokens": 0,
+        },
+    }
+
+
+def _mistral(body: Dict[str, Any], dimensions: int) -> Dict[str, Any]:
+    texts = body["inputs"] if isinstance(body["inputs"], list) else [body["inputs"]]
+    return _openai_like(texts, body["model"])
+
+
+def _together(body: Dict[str, Any], dimensions: int) -> Dict[str, Any]:
+    texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    return _openai_like(texts, body["model"])
+
+
+_PROVIDERS = {
+    "nomic": _nomic,
+    "cloudflare": _cloudflare,
+    "mistral": _mistral,
+    "together": _together,
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "StubServer"
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        config = self.server.config
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        provider = _PROVIDERS.get(self.path.strip("/").split("/")[0])
+        if provider is None:
+            self._respond(404, {"error": f"Unknown provider path {self.path}"})
+            return
+        with self.server.lock:
+            delay = config.latency + config.random.uniform(0, config.jitter)
+            failed = config.random.random() < config.error_rate
+            # half of the failures are rate limits, the other half transient server errors
+            rate_limited = config.random.random() < 0.5
+            self.server.requests += 1
+            self.server.errors += failed
+        time.sleep(delay)
+        dimensions = body.get("dimensionality") or config.dimensions
+        if failed and rate_limited:
+            self._respond(429, {"error": "rate limited"}, {"Retry-After": "0"})
+        elif failed:
+            self._respond(503, {"error": "overloaded"})
+        else:
+            self._respond(200, provider(body, dimensions), dimensions=dimensions)
+
+    def _respond(
+        self,
+        status: int,
+        payload: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+        dimensions: int = 0,
+    ) -> None:
+        data = _encode(payload, dimensions)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Serves the provider stand-ins on localhost from a background thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, config: Optional[StubConfig] = None, port: int = 0):
+        """
+        :param config: The latency, error rate and dimensions of the responses.
+        :param port: The port to listen on. Default is 0 (any free port).
+        """
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.config = config or StubConfig()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="provider-stubs", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--dimensions", type=int, default=768)
+    args = parser.parse_args()
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        dimensions=args.dimensions,
+    )
+    server = StubServer(config, args.port)
+    print(f"Serving provider stubs on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
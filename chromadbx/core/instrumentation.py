@@ -0,0 +1,307 @@
+import contextvars
+import functools
+import inspect
+import itertools
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar, Union, cast
+
+from typing_extensions import TypedDict
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_ids = itertools.count(1)
+_instrumentation: Optional["Instrumentation"] = None
+_current_span: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar(
+    "chromadbx_span", default=None
+)
+
+
+class InstrumentationEvent(TypedDict, total=False):
+    """
+    An event emitted when an operation of an embedding function or reranker starts and ends. The end event is the
+    start event updated with `seconds` and `error`.
+    """
+
+    id: int
+    parent_id: Optional[int]
+    component: str
+    operation: str
+    items: int
+    tokens: int
+    bytes: int
+    start_time: float
+    seconds: float
+    error: Optional[BaseException]
+    attributes: Dict[str, Any]
+
+
+class Instrumentation:
+    """
+    The hook interface of chromadbx instrumentation, override `on_start` and `on_end` to receive the events.
+    Hooks are called synchronously from the thread of the operation and must not raise.
+    """
+
+    def on_start(self, event: InstrumentationEvent) -> None:
+        pass
+
+    def on_end(self, event: InstrumentationEvent) -> None:
+        pass
+
+
+def set_instrumentation(instrumentation: Optional[Instrumentation]) -> None:
+    """
+    Set the instrumentation that all chromadbx embedding functions and rerankers emit events to.
+
+    :param instrumentation: The instrumentation, None (the default) disables instrumentation without overhead.
+    """
+    global _instrumentation
+    _instrumentation = instrumentation
+
+
+def get_instrumentation() -> Optional[Instrumentation]:
+    return _instrumentation
+
+
+class Span:
+    """
+    A running operation. Attributes set on the span are part of its end event.
+    """
+
+    __slots__ = ("event", "_instrumentation", "_token")
+
+    def __init__(self, instrumentation: Instrumentation, event: InstrumentationEvent):
+        self.event = event
+        self._instrumentation = instrumentation
+        self._token: Optional[contextvars.Token[Optional[Span]]] = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.event["attributes"][key] = value
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        self.event["start_time"] = time.perf_counter()
+        self._instrumentation.on_start(self.event)
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Optional[BaseException], tb: Any) -> None:
+        self.event["seconds"] = time.perf_counter() - self.event["start_time"]
+        self.event["error"] = exc
+        if self._token is not None:
+            _current_span.reset(self._token)
+        self._instrumentation.on_end(self.event)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def current_span() -> Union[Span, _NoopSpan]:
+    """
+    The innermost running span of the current thread or task, a no-op span if there is none.
+    """
+    if _instrumentation is None:
+        return _NOOP_SPAN
+    return _current_span.get() or _NOOP_SPAN
+
+
+def _sizes(input: Any) -> Dict[str, int]:
+    if isinstance(input, str):
+        input = [input]
+    if not isinstance(input, (list, tuple)) or not all(
+        isinstance(text, str) for text in input
+    ):
+        return {"items": len(input)} if isinstance(input, (list, tuple)) else {}
+    from chromadbx.core.ratelimit import estimate_batch_tokens
+
+    return {
+        "items": len(input),
+        "tokens": estimate_batch_tokens(input),
+        "bytes": sum(len(text.encode("utf-8")) for text in input),
+    }
+
+
+def instrument(
+    component: Optional[str], operation: str, input: Any = None, **attributes: Any
+) -> Union[Span, _NoopSpan]:
+    """
+    Start a span for an operation, use it as a context manager.
+
+    :param component: The name of the component, e.g. the class name. Default is the component of the enclosing span.
+    :param operation: The name of the operation, e.g. "embed" or "request".
+    :param input: The texts of the operation, used to measure the number of items, estimated tokens and bytes.
+    :param attributes: Additional attributes of the span.
+    """
+    instrumentation = _instrumentation
+    if instrumentation is None:
+        return _NOOP_SPAN
+    parent = _current_span.get()
+    event: InstrumentationEvent = {
+        "id": next(_ids),
+        "parent_id": parent.event["id"] if parent is not None else None,
+        "component": component
+        or (parent.event["component"] if parent is not None else ""),
+        "operation": operation,
+        "attributes": attributes,
+    }
+    if input is not None:
+        event.update(_sizes(input))  # type: ignore[typeddict-item]
+    return Span(instrumentation, event)
+
+
+def instrumented(operation: str) -> Callable[[F], F]:
+    """
+    Instrument a method that takes the texts as its first argument, e.g. `__call__` of an embedding function.
+    """
+
+    def decorator(fn: F) -> F:
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+                if _instrumentation is None:
+                    return await fn(self, *args, **kwargs)
+                input = args[0] if args else next(iter(kwargs.values()), None)
+                with instrument(type(self).__name__, operation, input):
+                    return await fn(self, *args, **kwargs)
+
+            return cast(F, async_wrapper)
+
+        @functools.wraps(fn)
+        def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+            if _instrumentation is None:
+                return fn(self, *args, **kwargs)
+            input = args[0] if args else next(iter(kwargs.values()), None)
+            with instrument(type(self).__name__, operation, input):
+                return fn(self, *args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorator
+
+
+class CompositeInstrumentation(Instrumentation):
+    """
+    Emits the events to several instrumentations.
+    """
+
+    def __init__(self, *instrumentations: Instrumentation):
+        self._instrumentations = instrumentations
+
+    def on_start(self, event: InstrumentationEvent) -> None:
+        for instrumentation in self._instrumentations:
+            instrumentation.on_start(event)
+
+    def on_end(self, event: InstrumentationEvent) -> None:
+        for instrumentation in self._instrumentations:
+            instrumentation.on_end(event)
+
+
+class LoggingInstrumentation(Instrumentation):
+    """
+    Logs a line with the duration, sizes and attributes of every finished operation.
+    """
+
+    def __init__(
+        self, logger: Optional[logging.Logger] = None, level: int = logging.INFO
+    ):
+        """
+        :param logger: The logger. Default is the `chromadbx.instrumentation` logger.
+        :param level: The level of successful operations, failures are logged as warnings. Default is INFO.
+        """
+        self._logger = logger or logging.getLogger("chromadbx.instrumentation")
+        self._level = level
+
+    def on_end(self, event: InstrumentationEvent) -> None:
+        error = event.get("error")
+        level = logging.WARNING if error is not None else self._level
+        if not self._logger.isEnabledFor(level):
+            return
+        sizes = " ".join(
+            f"{key}={event[key]}"  # type: ignore[literal-required]
+            for key in ("items", "tokens", "bytes")
+            if key in event
+        )
+        attributes = " ".join(
+            f"{key}={value}" for key, value in event["attributes"].items()
+        )
+        self._logger.log(
+            level,
+            f"{event['component']}.{event['operation']} {event['seconds'] * 1000:.2f}ms "
+            f"{sizes} {attributes}".rstrip()
+            + (f" error={error!r}" if error is not None else ""),
+        )
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """
+    Records every operation as a span of an OpenTelemetry tracer, nested operations become child spans.
+    Any tracer with the `start_span(name, context=None, attributes=None)` method of the OpenTelemetry API works.
+    """
+
+    def __init__(self, tracer: Optional[Any] = None):
+        """
+        :param tracer: The tracer. Default is the `chromadbx` tracer of the global OpenTelemetry tracer provider.
+        """
+        try:
+            from opentelemetry import trace
+
+            self._set_span_in_context: Optional[
+                Callable[..., Any]
+            ] = trace.set_span_in_context
+        except ImportError:
+            if tracer is None:
+                raise ValueError(
+                    "The opentelemetry-api python package is not installed. Please install it with `pip install opentelemetry-api`"
+                )
+            self._set_span_in_context = None
+        self._tracer = tracer or trace.get_tracer("chromadbx")
+        self._spans: Dict[int, Any] = {}
+
+    def on_start(self, event: InstrumentationEvent) -> None:
+        parent = self._spans.get(event["parent_id"] or 0)
+        context = (
+            self._set_span_in_context(parent)
+            if parent is not None and self._set_span_in_context is not None
+            else None
+        )
+        attributes = {
+            f"chromadbx.{key}": event[key]  # type: ignore[literal-required]
+            for key in ("items", "tokens", "bytes")
+            if key in event
+        }
+        self._spans[event["id"]] = self._tracer.start_span(
+            f"{event['component']}.{event['operation']}",
+            context=context,
+            attributes=attributes,
+        )
+
+    def on_end(self, event: InstrumentationEvent) -> None:
+        span = self._spans.pop(event["id"], None)
+        if span is None:
+            return
+        for key, value in event["attributes"].items():
+            if isinstance(value, (str, bool, int, float)):
+                span.set_attribute(f"chromadbx.{key}", value)
+        error = event.get("error")
+        if error is not None:
+            span.record_exception(error)
+            try:
+                from opentelemetry.trace import Status, StatusCode
+
+                span.set_status(Status(StatusCode.ERROR, str(error)))
+            except ImportError:
+                pass
+        span.end()
@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Iterable,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+import httpx
+
+from chromadbx.core.instrumentation import instrument
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# rough number of characters per token of English text for the common subword tokenizers
+CHARS_PER_TOKEN = 4
+# HTTP status codes of errors that are expected to go away when the request is repeated
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def estimate_batch_tokens(texts: Iterable[str]) -> int:
+    return sum(estimate_tokens(text) for text in texts)
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self._rate = rate
+        self._capacity = capacity
+        self._available = capacity
+        self._updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._available = min(
+            self._capacity, self._available + (now - self._updated) * self._rate
+        )
+        self._updated = now
+        # the bucket may go into debt, later callers wait until it is paid back
+        self._available -= amount
+        return max(0.0, -self._available / self._rate)
+
+
+class RateLimiter:
+    """
+    A token bucket rate limiter for requests per second and tokens per minute. A single instance can be
+    shared by many embedding functions and rerankers, from any number of threads and event loops.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        *,
+        burst: Optional[int] = None,
+    ):
+        """
+        Initialize the RateLimiter.
+
+        :param requests_per_second: The maximum sustained number of requests per second. Default is None (no limit).
+        :param tokens_per_minute: The maximum sustained number of (estimated) tokens per minute. Default is None (no limit).
+        :param burst: The number of requests that can be made at once after a pause. Default is one second worth of requests.
+        """
+        if requests_per_second is not None and requests_per_second <= 0:
+            raise ValueError("Requests per second must be positive")
+        if tokens_per_minute is not None and tokens_per_minute <= 0:
+            raise ValueError("Tokens per minute must be positive")
+        self._lock = threading.Lock()
+        self._requests = (
+            _TokenBucket(requests_per_second, burst or max(1.0, requests_per_second))
+            if requests_per_second
+            else None
+        )
+        self._tokens = (
+            _TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+            if tokens_per_minute
+            else None
+        )
+
+    def reserve(self, tokens: int = 0) -> float:
+        """
+        Reserve capacity for one request.
+
+        :param tokens: The (estimated) number of tokens of the request.
+        :return: The number of seconds to wait before sending the request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self._requests is not None:
+                wait = max(wait, self._requests.reserve(1, now))
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.reserve(tokens, now))
+            return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Wait until one request can be sent and return the number of seconds waited.
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_details(error: BaseException) -> Tuple[Optional[int], Optional[float]]:
+    """
+    The HTTP status code and the Retry-After delay of an httpx or provider SDK error.
+    """
+    response: Any = getattr(error, "response", None)
+    if response is None:
+        response = getattr(error, "raw_response", None)
+    status = None
+    for value in (
+        getattr(error, "status_code", None),
+        getattr(error, "http_status", None),
+        getattr(response, "status_code", None),
+        getattr(error, "code", None),
+    ):
+        if isinstance(value, int):
+            status = value
+            break
+    headers = getattr(error, "headers", None)
+    if headers is None:
+        headers = getattr(response, "headers", None)
+    retry_after = None
+    if headers is not None:
+        try:
+            retry_after = _parse_retry_after(
+                headers.get("retry-after") or headers.get("Retry-After")
+            )
+        except AttributeError:
+            pass
+    return status, retry_after
+
+
+class RetryPolicy:
+    """
+    Retries failed requests with jittered exponential backoff. A Retry-After header sent by the provider
+    is used as the minimum delay.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        *,
+        initial_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        jitter: bool = True,
+        retry_on_status: Tuple[int, ...] = RETRYABLE_STATUS_CODES,
+    ):
+        """
+        Initialize the RetryPolicy.
+
+        :param max_retries: The maximum number of retries of a request. Default is 3.
+        :param initial_backoff: The backoff before the first retry in seconds, doubled for every further retry. Default is 0.5.
+        :param max_backoff: The maximum backoff in seconds. Default is 30.
+        :param jitter: Whether to randomize the backoff between zero and its nominal value (full jitter). Default is True.
+        :param retry_on_status: The HTTP status codes that are retried. Connection errors and timeouts are always retried.
+        """
+        if max_retries < 0:
+            raise ValueError("Max retries must not be negative")
+        self.max_retries = max_retries
+        self._initial_backoff = initial_backoff
+        self._max_backoff = max_backoff
+        self._jitter = jitter
+        self._retry_on_status = retry_on_status
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        The delay in seconds before retry number `attempt` (starting at 0).
+        """
+        delay = min(self._max_backoff, self._initial_backoff * 2.0**attempt)
+        if self._jitter:
+            delay = random.uniform(0, delay)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def retry_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """
+        The delay before retrying a request that failed with `error`, or None if it must not be retried.
+        """
+        if attempt >= self.max_retries:
+            return None
+        if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+            return self.backoff(attempt)
+        status, retry_after = _error_details(error)
+        if status is None or status not in self._retry_on_status:
+            return None
+        return self.backoff(attempt, retry_after)
+
+
+def call_with_retry(
+    fn: Callable[[], T],
+    *,
+    retry_policy: Optional[RetryPolicy] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    tokens: Optional[int] = None,
+    input: Optional[Sequence[str]] = None,
+) -> T:
+    """
+    Call `fn` after waiting for the rate limiter and retry it according to the retry policy.
+    The size of the request is `tokens` or estimated from the texts sent (`input`).
+    """
+    if tokens is None:
+        tokens = estimate_batch_tokens(input) if input else 0
+    attempt = 0
+    rate_limit_wait = 0.0
+    with instrument(None, "request", input) as span:
+        while True:
+            if rate_limiter is not None:
+                rate_limit_wait += rate_limiter.acquire(tokens)
+            try:
+                result = fn()
+                break
+            except Exception as e:
+                delay = retry_policy.retry_delay(e, attempt) if retry_policy else None
+                if delay is None:
+                    span.set("retries", attempt)
+                    raise
+                logger.warning(f"Request failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+        span.set("retries", attempt)
+        span.set("rate_limit_wait", rate_limit_wait)
+    return result
+
+
+async def acall_with_retry(
+    fn: Callable[[], Awaitable[T]],
+    *,
+    retry_policy: Optional[RetryPolicy] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    tokens: Optional[int] = None,
+    input: Optional[Sequence[str]] = None,
+) -> T:
+    """
+    Await `fn` after waiting for the rate limiter and retry it according to the retry policy.
+    The size of the request is `tokens` or estimated from the texts sent (`input`).
+    """
+    if tokens is None:
+        tokens = estimate_batch_tokens(input) if input else 0
+    attempt = 0
+    rate_limit_wait = 0.0
+    with instrument(None, "request", input) as span:
+        while True:
+            if rate_limiter is not None:
+                rate_limit_wait += await rate_limiter.aacquire(tokens)
+            try:
+                result = await fn()
+                break
+            except Exception as e:
+                delay = retry_policy.retry_delay(e, attempt) if retry_policy else None
+                if delay is None:
+                    span.set("retries", attempt)
+                    raise
+                logger.warning(f"Request failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+        span.set("retries", attempt)
+        span.set("rate_limit_wait", rate_limit_wait)
+    return result
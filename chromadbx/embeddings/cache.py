@@ -0,0 +1,216 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple, cast
+
+import numpy as np
+import numpy.typing as npt
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from typing_extensions import TypedDict
+
+from chromadbx.core.instrumentation import current_span, instrumented
+from chromadbx.core.ids import generate_documents_sha256_hash
+from chromadbx.embeddings.utils import check_numpy_embeddings, model_identity
+
+# the maximum number of parameters of a single SQLite query
+_SQLITE_MAX_PARAMS = 500
+
+
+class CacheStats(TypedDict):
+    hits: int
+    misses: int
+    memory_hits: int
+    disk_hits: int
+    hit_rate: float
+
+
+class _DiskStore:
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets several processes read the cache while one of them writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, sha256 TEXT NOT NULL, embedding BLOB NOT NULL, "
+            "PRIMARY KEY (model, sha256)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def get_many(
+        self, model: str, hashes: List[str]
+    ) -> Dict[str, npt.NDArray[np.float32]]:
+        found: Dict[str, npt.NDArray[np.float32]] = {}
+        with self._lock:
+            for start in range(0, len(hashes), _SQLITE_MAX_PARAMS):
+                chunk = hashes[start : start + _SQLITE_MAX_PARAMS]
+                rows = self._conn.execute(
+                    "SELECT sha256, embedding FROM embeddings WHERE model = ? AND sha256 IN "
+                    f"({', '.join('?' * len(chunk))})",
+                    [model, *chunk],
+                )
+                for sha256, blob in rows:
+                    found[sha256] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(
+        self, model: str, items: Iterable[Tuple[str, npt.NDArray[np.float32]]]
+    ) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, sha256, embedding) VALUES (?, ?, ?)",
+                [(model, sha256, embedding.tobytes()) for sha256, embedding in items],
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[misc]
+    """
+    This class caches the embeddings of any embedding function by model identity and document SHA-256.
+    """
+
+    def __init__(
+        self,
+        embedding_function: EmbeddingFunction[Documents],
+        *,
+        cache_path: Optional[str] = None,
+        model_id: Optional[str] = None,
+        max_memory_items: int = 10_000,
+        return_numpy: Optional[bool] = False,
+    ):
+        """
+        Initialize the CachedEmbeddingFunction.
+
+        :param embedding_function: The embedding function to cache.
+        :param cache_path: The path of the SQLite database that persists the cache. Default is None (in-memory only).
+        :param model_id: The identity of the model used in the cache key. Required for embedding functions without a
+            `model_identity()` method. Default is derived from the class and the `model_identity()` of the embedding function.
+        :param max_memory_items: The number of embeddings kept in the in-memory LRU tier. Default is 10000, 0 disables it.
+        :param return_numpy: Whether to return the embeddings as float32 numpy rows of one matrix instead of lists. Default is False.
+        """
+        if max_memory_items < 0:
+            raise ValueError("Max memory items must not be negative")
+        self._embedding_function = embedding_function
+        self._fixed_model_id = model_id
+        # fail early for embedding functions without an identity
+        self._model_id()
+        self._max_memory_items = max_memory_items
+        check_numpy_embeddings(return_numpy)
+        self._return_numpy = return_numpy
+        # keyed by (model id, document hash)
+        self._memory: "OrderedDict[Tuple[str, str], npt.NDArray[np.float32]]" = (
+            OrderedDict()
+        )
+        self._disk = _DiskStore(cache_path) if cache_path else None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._memory_hits = 0
+        self._disk_hits = 0
+
+    def _model_id(self) -> str:
+        # derived on every call as the model of the embedding function may be reloaded
+        return hashlib.sha256(
+            (self._fixed_model_id or model_identity(self._embedding_function)).encode(
+                "utf-8"
+            )
+        ).hexdigest()
+
+    def _get_memory(
+        self, model_id: str, hashes: List[str]
+    ) -> Dict[str, npt.NDArray[np.float32]]:
+        found = {}
+        with self._lock:
+            for sha256 in hashes:
+                embedding = self._memory.get((model_id, sha256))
+                if embedding is not None:
+                    self._memory.move_to_end((model_id, sha256))
+                    found[sha256] = embedding
+        return found
+
+    def _put_memory(
+        self, model_id: str, items: Dict[str, npt.NDArray[np.float32]]
+    ) -> None:
+        if self._max_memory_items == 0:
+            return
+        with self._lock:
+            for sha256, embedding in items.items():
+                self._memory[(model_id, sha256)] = embedding
+                self._memory.move_to_end((model_id, sha256))
+            while len(self._memory) > self._max_memory_items:
+                self._memory.popitem(last=False)
+
+    @instrumented("embed")
+    def __call__(self, input: Documents) -> Embeddings:
+        model_id = self._model_id()
+        hashes = list(generate_documents_sha256_hash(input))
+        unique = list(dict.fromkeys(hashes))
+        found = self._get_memory(model_id, unique)
+        memory_hits = len(found)
+        disk_hits = 0
+        if self._disk is not None and len(found) < len(unique):
+            from_disk = self._disk.get_many(
+                model_id, [h for h in unique if h not in found]
+            )
+            disk_hits = len(from_disk)
+            found.update(from_disk)
+            self._put_memory(model_id, from_disk)
+        # every missing document is embedded once, in a single upstream call
+        missing = {h: doc for h, doc in zip(hashes, input) if h not in found}
+        if missing:
+            embedded = np.asarray(
+                self._embedding_function(list(missing.values())), dtype=np.float32
+            )
+            # rows are copied so that evicting them from the LRU frees the memory of the whole batch
+            computed = {h: row.copy() for h, row in zip(missing.keys(), embedded)}
+            found.update(computed)
+            self._put_memory(model_id, computed)
+            if self._disk is not None:
+                self._disk.put_many(model_id, computed.items())
+        span = current_span()
+        span.set("memory_hits", memory_hits)
+        span.set("disk_hits", disk_hits)
+        span.set("misses", len(missing))
+        with self._lock:
+            self._hits += memory_hits + disk_hits
+            self._misses += len(missing)
+            self._memory_hits += memory_hits
+            self._disk_hits += disk_hits
+        embeddings = np.array([found[h] for h in hashes], dtype=np.float32)
+        if self._return_numpy:
+            return cast(Embeddings, embeddings)
+        return cast(Embeddings, embeddings.tolist())
+
+    @property
+    def stats(self) -> CacheStats:
+        """
+        The number of unique documents served from the cache (`hits`) and embedded upstream (`misses`) since the last reset.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._memory_hits = 0
+            self._disk_hits = 0
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
@@ -1,12 +1,26 @@
 # original work on this was done by @mileszim - https://github.com/mileszim/chroma/tree/cloudflare-workers-ai-embedding
 import logging
 import os
-from typing import Optional, Dict, cast
+from typing import Any, Optional, Dict, cast
 
 import httpx
 
 from chromadb import Documents, EmbeddingFunction, Embeddings
 
+from chromadbx.core.instrumentation import instrumented
+from chromadbx.core.ratelimit import (
+    RateLimiter,
+    RetryPolicy,
+    acall_with_retry,
+    call_with_retry,
+)
+from chromadbx.embeddings.utils import (
+    Batcher,
+    ConcurrencyLimit,
+    HTTPClientOptions,
+    LoopLocal,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,6 +42,17 @@ class CloudflareWorkersAIEmbeddings(EmbeddingFunction[Documents]):  # type: igno
         # https://developers.cloudflare.com/workers-ai/models/bge-small-en-v1.5/#api-schema (Input JSON Schema)
         max_batch_size: Optional[int] = 100,
         headers: Optional[Dict[str, str]] = None,
+        max_concurrency: Optional[int] = 16,
+        max_batch_tokens: Optional[int] = None,
+        parallelism: Optional[int] = 4,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        http2: bool = False,
+        max_connections: Optional[int] = 100,
+        max_keepalive_connections: Optional[int] = 20,
+        keepalive_expiry: Optional[float] = 5.0,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
     ):
         """
         Initialize the Cloudflare Workers AI Embeddings function.
@@ -36,8 +61,19 @@ class CloudflareWorkersAIEmbeddings(EmbeddingFunction[Documents]):  # type: igno
         :param api_token: The API token to use. Defaults to the CF_API_TOKEN environment variable.
         :param account_id: The account ID to use.
         :param gateway_endpoint: The gateway URL to use.
-        :param max_batch_size: The maximum batch size to use. Defaults to 100.
+        :param max_batch_size: The maximum number of texts per request, larger inputs are split into several requests. Defaults to 100.
         :param headers: The headers to use. Defaults to None.
+        :param max_concurrency: The maximum number of concurrent requests made by `aembed`. Defaults to 16, None for no limit.
+        :param max_batch_tokens: The maximum number of estimated tokens per request. Defaults to None (no limit).
+        :param parallelism: The number of requests of a split input that are sent at the same time. Defaults to 4.
+        :param rate_limiter: The rate limiter to wait for before every request, can be shared between instances. Defaults to None (no limit).
+        :param retry_policy: How to retry requests that failed with a retryable error (e.g. 429). Defaults to 3 retries with jittered exponential backoff.
+        :param http2: Whether to negotiate HTTP/2, which multiplexes concurrent requests over one connection. Requires `pip install httpx[http2]`. Defaults to False.
+        :param max_connections: The maximum number of open connections. Defaults to 100, None for no limit.
+        :param max_keepalive_connections: The maximum number of idle connections kept open. Defaults to 20, None for no limit.
+        :param keepalive_expiry: The number of seconds after which idle connections are closed. Defaults to 5, None to keep them open.
+        :param transport: A transport shared with other clients, e.g. from `chromadbx.embeddings.utils.create_transport`. Replaces the connection settings above.
+        :param async_transport: A transport shared with other async clients, used by `aembed`. Replaces the connection settings above.
         """
         if not gateway_endpoint and not account_id:
             raise ValueError(
@@ -49,27 +85,78 @@ class CloudflareWorkersAIEmbeddings(EmbeddingFunction[Documents]):  # type: igno
             )
         if gateway_endpoint is not None and not gateway_endpoint.endswith("/"):
             gateway_endpoint += "/"
+        self._model_name = model_name
         self._api_url = (
             f"{gateway_endpoint}{model_name}"
             if gateway_endpoint is not None
             else f"https://api.cloudflare.com/client/v4/accounts/{account_id}/ai/run/{model_name}"
         )
-        self._session = httpx.Client()
-        self._session.headers.update(headers or {})
-        self._session.headers.update({"Authorization": f"Bearer {api_token}"})
-        self._max_batch_size = max_batch_size
+        self._headers = {**(headers or {}), "Authorization": f"Bearer {api_token}"}
+        self._http_options = HTTPClientOptions(
+            headers=self._headers,
+            http2=http2,
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+            transport=transport,
+            async_transport=async_transport,
+        )
+        self._session = self._http_options.client()
+        self._batcher = Batcher(max_batch_size, max_batch_tokens, parallelism)
+        self._concurrency_limit = ConcurrencyLimit(max_concurrency)
+        self._rate_limiter = rate_limiter
+        self._retry_policy = retry_policy or RetryPolicy()
+        # an async client is bound to the event loop it is first used in
+        self._async_session: LoopLocal[httpx.AsyncClient] = LoopLocal(
+            self._http_options.async_client
+        )
+
+    def model_identity(self) -> Dict[str, Any]:
+        return {"model_name": self._model_name}
 
+    @instrumented("embed")
     def __call__(self, texts: Documents) -> Embeddings:
-        # Endpoint accepts up to 100 items at a time. We'll reject anything larger.
-        # It would be up to the user to split the input into smaller batches.
-        if self._max_batch_size and len(texts) > self._max_batch_size:
-            raise ValueError(
-                f"Batch too large {len(texts)} > {self._max_batch_size} (maximum batch size)."
-            )
+        return self._batcher(self._embed_batch, texts)
+
+    def _embed_batch(self, texts: Documents) -> Embeddings:
+        return call_with_retry(
+            lambda: self._parse(
+                self._session.post(f"{self._api_url}", json={"text": texts})
+            ),
+            retry_policy=self._retry_policy,
+            rate_limiter=self._rate_limiter,
+            input=texts,
+        )
 
-        print("URI", self._api_url)
+    @instrumented("aembed")
+    async def aembed(self, texts: Documents) -> Embeddings:
+        """
+        Get the embeddings for a list of texts without blocking the event loop.
+
+        :param texts: A list of texts to get embeddings for.
+        :return: The embeddings for the texts.
+        """
+        return await self._batcher.acall(self._aembed_batch, texts)
+
+    async def _aembed_batch(self, texts: Documents) -> Embeddings:
+        async_session = self._async_session.get()
+
+        async def request() -> Embeddings:
+            async with self._concurrency_limit:
+                response = await async_session.post(
+                    f"{self._api_url}", json={"text": texts}
+                )
+            return self._parse(response)
+
+        return await acall_with_retry(
+            request,
+            retry_policy=self._retry_policy,
+            rate_limiter=self._rate_limiter,
+            input=texts,
+        )
 
-        response = self._session.post(f"{self._api_url}", json={"text": texts})
+    @staticmethod
+    def _parse(response: httpx.Response) -> Embeddings:
         response.raise_for_status()
         _json = response.json()
         if "result" in _json and "data" in _json["result"]:
@@ -0,0 +1,72 @@
+from typing import Any, Dict, Optional, cast
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from chromadbx.core.instrumentation import instrumented
+from chromadbx.embeddings.utils import Coalescer, check_numpy_embeddings, model_identity
+
+
+class CoalescingEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[misc]
+    """
+    This class collects the documents of concurrent calls from many threads and embeds them together in a single call
+    of the wrapped embedding function, e.g. single queries from the request threads of a web server.
+    """
+
+    def __init__(
+        self,
+        embedding_function: EmbeddingFunction[Documents],
+        *,
+        max_batch_size: int = 64,
+        max_wait: float = 0.002,
+        return_numpy: Optional[bool] = False,
+    ):
+        """
+        Initialize the CoalescingEmbeddingFunction.
+
+        :param embedding_function: The embedding function to send the batched documents to.
+        :param max_batch_size: The number of documents after which a batch is sent without waiting. Default is 64.
+        :param max_wait: The maximum time in seconds a call waits for other calls to join its batch. Default is 0.002.
+        :param return_numpy: Whether to return the embeddings as float32 numpy rows of one matrix instead of lists. Default is False.
+        """
+        if max_batch_size < 1:
+            raise ValueError("Max batch size must be at least 1")
+        if max_wait < 0:
+            raise ValueError("Max wait must not be negative")
+        self._embedding_function = embedding_function
+        self._max_batch_size = max_batch_size
+        check_numpy_embeddings(return_numpy)
+        self._return_numpy = return_numpy
+        self._coalescer: Optional[Coalescer] = Coalescer(
+            embedding_function, max_batch_size, max_wait
+        )
+
+    def model_identity(self) -> Dict[str, Any]:
+        return {"embedding_function": model_identity(self._embedding_function)}
+
+    @instrumented("embed")
+    def __call__(self, input: Documents) -> Embeddings:
+        if self._coalescer is None:
+            raise RuntimeError("The embedding function is closed")
+        if len(input) >= self._max_batch_size:
+            # a full batch gains nothing from waiting for others
+            embeddings = np.asarray(self._embedding_function(input), dtype=np.float32)
+        else:
+            embeddings = self._coalescer.submit(input).result()
+        if self._return_numpy:
+            return cast(Embeddings, embeddings)
+        return cast(Embeddings, embeddings.tolist())
+
+    def close(self) -> None:
+        """
+        Embed the pending documents and stop the batching thread.
+        """
+        if self._coalescer is not None:
+            self._coalescer.close()
+            self._coalescer = None
+
+    def __enter__(self) -> "CoalescingEmbeddingFunction":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
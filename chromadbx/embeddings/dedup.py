@@ -0,0 +1,48 @@
+from typing import Any, Dict, List, Tuple, cast
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from chromadbx.core.instrumentation import current_span, instrumented
+from chromadbx.embeddings.utils import model_identity
+
+
+def deduplicate(documents: Documents) -> Tuple[List[str], List[int]]:
+    """
+    Collapse identical documents.
+
+    :param documents: The documents to deduplicate.
+    :return: The unique documents in order of first occurrence and, for every input document, the position of its unique document.
+    """
+    positions: Dict[str, int] = {}
+    inverse = [positions.setdefault(document, len(positions)) for document in documents]
+    return list(positions), inverse
+
+
+class DeduplicatingEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[misc]
+    """
+    This class embeds every unique document of a batch only once with the wrapped embedding function.
+    """
+
+    def __init__(self, embedding_function: EmbeddingFunction[Documents]):
+        """
+        Initialize the DeduplicatingEmbeddingFunction.
+
+        :param embedding_function: The embedding function to send the unique documents to.
+        """
+        self._embedding_function = embedding_function
+
+    def model_identity(self) -> Dict[str, Any]:
+        return {"embedding_function": model_identity(self._embedding_function)}
+
+    @instrumented("embed")
+    def __call__(self, input: Documents) -> Embeddings:
+        unique, inverse = deduplicate(input)
+        current_span().set("unique", len(unique))
+        if len(unique) == len(input):
+            return cast(Embeddings, self._embedding_function(input))
+        embeddings = self._embedding_function(unique)
+        if isinstance(embeddings, np.ndarray):
+            # rows of a numpy array are views, duplicates share the memory of the unique embedding
+            embeddings = list(embeddings)
+        return cast(Embeddings, [embeddings[i] for i in inverse])
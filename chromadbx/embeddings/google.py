@@ -1,7 +1,16 @@
-from typing import Optional, cast, Any
+from typing import Optional, cast, Any, Dict, List, Tuple
 
 from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
 
+from chromadbx.core.instrumentation import instrumented
+from chromadbx.core.ratelimit import (
+    RateLimiter,
+    RetryPolicy,
+    acall_with_retry,
+    call_with_retry,
+)
+from chromadbx.embeddings.utils import Batcher, ConcurrencyLimit
+
 
 class GoogleVertexAiEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
     def __init__(
@@ -16,6 +25,12 @@ class GoogleVertexAiEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[mi
         api_key: Optional[str] = None,
         api_endpoint: Optional[str] = None,
         api_transport: Optional[str] = None,
+        max_concurrency: Optional[int] = 16,
+        max_batch_size: Optional[int] = 250,
+        max_batch_tokens: Optional[int] = 20000,
+        parallelism: Optional[int] = 4,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
     ) -> None:
         """
         Initialize the GoogleVertexAi.
@@ -29,6 +44,12 @@ class GoogleVertexAiEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[mi
         :param api_key: The API key to use. Defaults to None.
         :param api_endpoint: The API endpoint to use. Defaults to None.
         :param api_transport: The API transport to use. Defaults to None.
+        :param max_concurrency: The maximum number of concurrent requests made by `aembed`. Defaults to 16, None for no limit.
+        :param max_batch_size: The maximum number of texts per request, larger inputs are split into several requests. Defaults to 250.
+        :param max_batch_tokens: The maximum number of estimated tokens per request. Defaults to 20000.
+        :param parallelism: The number of requests of a split input that are sent at the same time. Defaults to 4.
+        :param rate_limiter: The rate limiter to wait for before every request, can be shared between instances. Defaults to None (no limit).
+        :param retry_policy: How to retry requests that failed with a retryable error (e.g. 429). Defaults to 3 retries with jittered exponential backoff.
         """
         try:
             import vertexai
@@ -47,18 +68,72 @@ class GoogleVertexAiEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[mi
             raise ValueError(
                 "The vertexai python package is not installed. Please install it with `pip install vertexai`"
             )
+        self._model_name = model_name
         self._dimensions = dimensions
         self._task_type = task_type
+        self._concurrency_limit = ConcurrencyLimit(max_concurrency)
+        self._rate_limiter = rate_limiter
+        self._retry_policy = retry_policy or RetryPolicy()
+        # Vertex AI accepts up to 250 texts and 20000 tokens per request
+        # https://cloud.google.com/vertex-ai/generative-ai/docs/embeddings/get-text-embeddings
+        self._batcher = Batcher(max_batch_size, max_batch_tokens, parallelism)
+
+    def model_identity(self) -> Dict[str, Any]:
+        return {
+            "model_name": self._model_name,
+            "dimensions": self._dimensions,
+            "task_type": self._task_type,
+        }
 
+    @instrumented("embed")
     def __call__(self, input: Documents) -> Embeddings:
+        return self._batcher(self._embed_batch, input)
+
+    def _embed_batch(self, input: Documents) -> Embeddings:
+        inputs, kwargs = self._inputs(input)
+
+        def request() -> Any:
+            return self._model.get_embeddings(inputs, **kwargs)
+
+        response = call_with_retry(
+            request,
+            retry_policy=self._retry_policy,
+            rate_limiter=self._rate_limiter,
+            input=input,
+        )
+        embeddings = [embedding.values for embedding in response]
+        return cast(Embeddings, embeddings)
+
+    @instrumented("aembed")
+    async def aembed(self, input: Documents) -> Embeddings:
+        """
+        Get the embeddings for a list of texts without blocking the event loop.
+
+        :param input: A list of texts to get embeddings for.
+        :return: The embeddings for the texts.
+        """
+        return await self._batcher.acall(self._aembed_batch, input)
+
+    async def _aembed_batch(self, input: Documents) -> Embeddings:
+        inputs, kwargs = self._inputs(input)
+
+        async def request() -> Any:
+            async with self._concurrency_limit:
+                return await self._model.get_embeddings_async(inputs, **kwargs)
+
+        response = await acall_with_retry(
+            request,
+            retry_policy=self._retry_policy,
+            rate_limiter=self._rate_limiter,
+            input=input,
+        )
+        return cast(Embeddings, [embedding.values for embedding in response])
+
+    def _inputs(self, input: Documents) -> Tuple[List[Any], Dict[str, Any]]:
         from vertexai.language_models import TextEmbeddingInput
 
         inputs = [TextEmbeddingInput(text, self._task_type) for text in input]
         kwargs = (
             dict(output_dimensionality=self._dimensions) if self._dimensions else {}
         )
-        embeddings = [
-            embedding.values
-            for embedding in self._model.get_embeddings(inputs, **kwargs)
-        ]
-        return cast(Embeddings, embeddings)
+        return inputs, kwargs
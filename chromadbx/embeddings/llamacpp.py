@@ -1,8 +1,12 @@
 import os.path
 from enum import Enum
-from typing import Optional
+from typing import Any, Dict, Optional, cast
 
-from chromadb import EmbeddingFunction, Documents
+import numpy as np
+from chromadb import EmbeddingFunction, Documents, Embeddings
+
+from chromadbx.core.instrumentation import instrumented
+from chromadbx.embeddings.utils import check_numpy_embeddings
 
 
 class PoolingType(int, Enum):
@@ -19,6 +23,7 @@ class LlamaCppEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[m
         *,
         hf_file_name: Optional[str] = None,
         pooling_type: Optional[PoolingType] = PoolingType.MEAN,
+        return_numpy: Optional[bool] = False,
     ) -> None:
         """
         Initialize the LlamaCppEmbeddingFunction.
@@ -27,7 +32,9 @@ class LlamaCppEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[m
         :param hf_file_name: The name of the file in the HuggingFace repository.
             This is only required if the model_path is a HuggingFace repository.
         :param pooling_type: The pooling type to use. Default is `PoolingType.MEAN`.
+        :param return_numpy: Whether to return the embeddings as float32 numpy rows of one matrix instead of lists. Default is False.
         """
+        check_numpy_embeddings(return_numpy)
         try:
             from llama_embedder import LlamaEmbedder, PoolingType as PT
         except ImportError:
@@ -62,7 +69,19 @@ class LlamaCppEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[m
         else:
             raise ValueError(f"Invalid pooling type: {pooling_type}")
 
+        self._pooling_type = pooling_type
         self._embedder = LlamaEmbedder(model_path=self._model_file, pooling_type=pt)
+        self._return_numpy = return_numpy
+
+    def model_identity(self) -> Dict[str, Any]:
+        return {
+            "model_file": self._model_file,
+            "pooling_type": self._pooling_type,
+        }
 
-    def __call__(self, input: Documents) -> Optional[Documents]:
-        return self._embedder.embed(input)
+    @instrumented("embed")
+    def __call__(self, input: Documents) -> Embeddings:
+        embeddings = self._embedder.embed(input)
+        if self._return_numpy:
+            return cast(Embeddings, np.asarray(embeddings, dtype=np.float32))
+        return cast(Embeddings, embeddings)
@@ -1,8 +1,17 @@
 import os
-from typing import Optional, cast
+from typing import Any, Dict, Optional, cast
 
 from chromadb.api.types import Documents, Embeddings, EmbeddingFunction
 
+from chromadbx.core.instrumentation import instrumented
+from chromadbx.core.ratelimit import (
+    RateLimiter,
+    RetryPolicy,
+    acall_with_retry,
+    call_with_retry,
+)
+from chromadbx.embeddings.utils import Batcher, ConcurrencyLimit
+
 
 class MistralAIEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
     """
@@ -15,25 +24,52 @@ class MistralAIEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
         *,
         api_key: Optional[str] = os.getenv("MISTRAL_API_KEY"),
         retries: Optional[int] = None,
+        max_concurrency: Optional[int] = 16,
+        max_batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = 16384,
+        parallelism: Optional[int] = 4,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        server_url: Optional[str] = None,
     ):
         """
         Initialize the Mistral AI EF.
 
         :param model_name: The name of the model to use. Defaults to "mistral-embed".
         :param api_key: The API key
-        :param retries: The number of retries to use. Defaults to None.
+        :param retries: The number of retries of a failed request. Defaults to None (3), ignored if `retry_policy` is given.
+        :param max_concurrency: The maximum number of concurrent requests made by `aembed`. Defaults to 16, None for no limit.
+        :param max_batch_size: The maximum number of texts per request, larger inputs are split into several requests. Defaults to None (no limit).
+        :param max_batch_tokens: The maximum number of estimated tokens per request. Defaults to 16384.
+        :param parallelism: The number of requests of a split input that are sent at the same time. Defaults to 4.
+        :param rate_limiter: The rate limiter to wait for before every request, can be shared between instances. Defaults to None (no limit).
+        :param retry_policy: How to retry requests that failed with a retryable error (e.g. 429). Replaces the retries of the Mistral AI client. Defaults to `retries` retries with jittered exponential backoff.
+        :param server_url: The base URL of the Mistral AI API, e.g. of a proxy. Defaults to None (the public API).
         """
         try:
             from mistralai import Mistral
 
-            self._client = Mistral(api_key=api_key)
+            # the retry policy replaces the client's own retries instead of compounding them
+            self._client = Mistral(
+                api_key=api_key, server_url=server_url, retry_config=None
+            )
             self._model = model_name
             self._retries = retries
+            self._rate_limiter = rate_limiter
+            self._retry_policy = retry_policy or (
+                RetryPolicy() if retries is None else RetryPolicy(max_retries=retries)
+            )
+            self._concurrency_limit = ConcurrencyLimit(max_concurrency)
+            self._batcher = Batcher(max_batch_size, max_batch_tokens, parallelism)
         except ImportError:
             raise ValueError(
                 "The mistralai python package is not installed. Please install it with `pip install mistralai`"
             )
 
+    def model_identity(self) -> Dict[str, Any]:
+        return {"model_name": self._model}
+
+    @instrumented("embed")
     def __call__(self, input: Documents) -> Embeddings:
         """
         Get the embeddings for a list of texts.
@@ -50,9 +86,52 @@ class MistralAIEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
             >>> texts = ["Hello, world!", "How are you?"]
             >>> embeddings = ef(texts)
         """
-        embeddings_batch_response = self._client.embeddings.create(
-            model=self._model,
-            inputs=input,
+        return self._batcher(self._embed_batch, input)
+
+    def _embed_batch(self, input: Documents) -> Embeddings:
+        def request() -> Any:
+            return self._client.embeddings.create(model=self._model, inputs=input)
+
+        embeddings_batch_response = call_with_retry(
+            request,
+            retry_policy=self._retry_policy,
+            rate_limiter=self._rate_limiter,
+            input=input,
+        )
+        embeddings = [d.embedding for d in embeddings_batch_response.data]
+        return cast(Embeddings, embeddings)
+
+    @instrumented("aembed")
+    async def aembed(self, input: Documents) -> Embeddings:
+        """
+        Get the embeddings for a list of texts without blocking the event loop.
+
+        Args:
+            input (Documents): A list of texts to get embeddings for.
+
+        Returns:
+            Embeddings: The embeddings for the texts.
+
+        Example:
+            >>> from chromadbx.embeddings.mistral import MistralAIEmbeddings
+            >>> ef = MistralAIEmbeddings(max_concurrency=32)
+            >>> embeddings = await ef.aembed(["Hello, world!", "How are you?"])
+        """
+        return await self._batcher.acall(self._aembed_batch, input)
+
+    async def _aembed_batch(self, input: Documents) -> Embeddings:
+        async def request() -> Any:
+            async with self._concurrency_limit:
+                return await self._client.embeddings.create_async(
+                    model=self._model,
+                    inputs=input,
+                )
+
+        embeddings_batch_response = await acall_with_retry(
+            request,
+            retry_policy=self._retry_policy,
+            rate_limiter=self._rate_limiter,
+            input=input,
         )
         embeddings = [d.embedding for d in embeddings_batch_response.data]
         return cast(Embeddings, embeddings)
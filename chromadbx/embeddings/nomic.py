@@ -1,9 +1,21 @@
 from enum import Enum
 import os
-from typing import Optional, cast
+from typing import TYPE_CHECKING, Any, Dict, Optional, cast
 
 from chromadb.api.types import Documents, Embeddings, EmbeddingFunction
 
+from chromadbx.core.instrumentation import instrumented
+from chromadbx.core.ratelimit import (
+    RateLimiter,
+    RetryPolicy,
+    acall_with_retry,
+    call_with_retry,
+)
+from chromadbx.embeddings.utils import ConcurrencyLimit, HTTPClientOptions, LoopLocal
+
+if TYPE_CHECKING:
+    import httpx
+
 
 class TaskType(str, Enum):
     SEARCH_DOCUMENT = "search_document"
@@ -32,6 +44,16 @@ class NomicEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[misc
         long_text_mode: Optional[LongTextMode] = LongTextMode.TRUNCATE,
         task_type: Optional[TaskType] = TaskType.SEARCH_DOCUMENT,
         timeout: Optional[float] = 60.0,
+        max_concurrency: Optional[int] = 16,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        http2: bool = False,
+        max_connections: Optional[int] = 100,
+        max_keepalive_connections: Optional[int] = 20,
+        keepalive_expiry: Optional[float] = 5.0,
+        transport: Optional["httpx.BaseTransport"] = None,
+        async_transport: Optional["httpx.AsyncBaseTransport"] = None,
+        api_url: str = "https://api-atlas.nomic.ai/v1/embedding/text",
     ) -> None:
         """
         Initialize the Nomic Embedding Function.
@@ -46,14 +68,17 @@ class NomicEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[misc
             long_text_mode (str): The mode to use for long texts. E.g. "truncate" or "mean".
             task_type (str): The task type to use for the Nomic Embedding API. E.g. "search_document", "search_query", "classification", and "clustering".
             timeout (float): The timeout for the Nomic Embedding API. E.g. 60.0 for 60 seconds.
+            max_concurrency (int): The maximum number of concurrent requests made by `aembed`. E.g. 16, None for no limit.
+            rate_limiter (RateLimiter): The rate limiter to wait for before every request, can be shared between instances. E.g. None for no limit.
+            retry_policy (RetryPolicy): How to retry requests that failed with a retryable error (e.g. 429). Defaults to 3 retries with jittered exponential backoff.
+            http2 (bool): Whether to negotiate HTTP/2, which multiplexes concurrent requests over one connection. Requires `pip install httpx[http2]`.
+            max_connections (int): The maximum number of open connections. E.g. 100, None for no limit.
+            max_keepalive_connections (int): The maximum number of idle connections kept open. E.g. 20, None for no limit.
+            keepalive_expiry (float): The number of seconds after which idle connections are closed. E.g. 5.0, None to keep them open.
+            transport (httpx.BaseTransport): A transport shared with other clients, e.g. from `chromadbx.embeddings.utils.create_transport`. Replaces the connection settings above.
+            async_transport (httpx.AsyncBaseTransport): A transport shared with other async clients, used by `aembed`. Replaces the connection settings above.
+            api_url (str): The URL of the embedding endpoint, e.g. of a proxy. E.g. "https://api-atlas.nomic.ai/v1/embedding/text".
         """
-        try:
-            import httpx
-        except ImportError:
-            raise ValueError(
-                "The httpx python package is not installed. Please install it with `pip install httpx`"
-            )
-
         if not api_key and os.getenv("NOMIC_API_KEY") is None:
             raise ValueError(
                 "No Nomic API key provided or NOMIC_API_KEY environment variable is not set"
@@ -61,20 +86,45 @@ class NomicEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[misc
         if not api_key:
             api_key = os.getenv("NOMIC_API_KEY")
 
-        self._api_url = "https://api-atlas.nomic.ai/v1/embedding/text"
+        self._api_url = api_url
         self._model_name = model_name
         self._task_type = task_type
         self._dimensionality = dimensionality
         self._long_text_mode = long_text_mode
         self._max_tokens_per_text = max_tokens_per_text
-        self._client = httpx.Client(timeout=timeout)
-        self._client.headers.update(
-            {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {api_key}",
-            }
+        self._headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}",
+        }
+        self._http_options = HTTPClientOptions(
+            headers=self._headers,
+            timeout=timeout,
+            http2=http2,
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+            transport=transport,
+            async_transport=async_transport,
+        )
+        self._client = self._http_options.client()
+        self._concurrency_limit = ConcurrencyLimit(max_concurrency)
+        self._rate_limiter = rate_limiter
+        self._retry_policy = retry_policy or RetryPolicy()
+        # an async client is bound to the event loop it is first used in
+        self._async_client: LoopLocal[httpx.AsyncClient] = LoopLocal(
+            self._http_options.async_client
         )
 
+    def model_identity(self) -> Dict[str, Any]:
+        return {
+            "model_name": self._model_name,
+            "task_type": self._task_type,
+            "dimensionality": self._dimensionality,
+            "long_text_mode": self._long_text_mode,
+            "max_tokens_per_text": self._max_tokens_per_text,
+        }
+
+    @instrumented("embed")
     def __call__(self, input: Documents) -> Embeddings:
         """
         Get the embeddings for a list of texts.
@@ -91,21 +141,62 @@ class NomicEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[misc
             >>> texts = ["Hello, world!", "How are you?"]
             >>> embeddings = nomic_ef(texts)
         """
-        texts = input if isinstance(input, list) else [input]
+        return call_with_retry(
+            lambda: self._parse(
+                self._client.post(self._api_url, json=self._payload(input))
+            ),
+            retry_policy=self._retry_policy,
+            rate_limiter=self._rate_limiter,
+            input=input,
+        )
+
+    @instrumented("aembed")
+    async def aembed(self, input: Documents) -> Embeddings:
+        """
+        Get the embeddings for a list of texts without blocking the event loop.
 
-        response = self._client.post(
-            self._api_url,
-            json={
-                "model": self._model_name,
-                "texts": texts,
-                "task_type": self._task_type.value if self._task_type else None,
-                "dimensionality": self._dimensionality,
-                "long_text_mode": self._long_text_mode.value
-                if self._long_text_mode
-                else None,
-                "max_tokens_per_text": self._max_tokens_per_text,
-            },
+        Args:
+            input (Documents): A list of texts to get embeddings for.
+
+        Returns:
+            Embeddings: The embeddings for the texts.
+
+        Example:
+            >>> from chromadbx.embeddings.nomic import NomicEmbeddingFunction
+            >>> nomic_ef = NomicEmbeddingFunction(model_name="nomic-embed-text-v1.5", max_concurrency=32)
+            >>> embeddings = await nomic_ef.aembed(["Hello, world!", "How are you?"])
+        """
+        async_client = self._async_client.get()
+
+        async def request() -> Embeddings:
+            async with self._concurrency_limit:
+                response = await async_client.post(
+                    self._api_url, json=self._payload(input)
+                )
+            return self._parse(response)
+
+        return await acall_with_retry(
+            request,
+            retry_policy=self._retry_policy,
+            rate_limiter=self._rate_limiter,
+            input=input,
         )
+
+    def _payload(self, input: Documents) -> Dict[str, Any]:
+        texts = input if isinstance(input, list) else [input]
+        return {
+            "model": self._model_name,
+            "texts": texts,
+            "task_type": self._task_type.value if self._task_type else None,
+            "dimensionality": self._dimensionality,
+            "long_text_mode": self._long_text_mode.value
+            if self._long_text_mode
+            else None,
+            "max_tokens_per_text": self._max_tokens_per_text,
+        }
+
+    @staticmethod
+    def _parse(response: "httpx.Response") -> Embeddings:  # type: ignore # noqa: F821
         response.raise_for_status()
         response_json = response.json()
         if "embeddings" not in response_json:
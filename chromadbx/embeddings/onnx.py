@@ -1,15 +1,388 @@
+import hashlib
 import importlib
 import logging
 import os
-from functools import cached_property
-from typing import List, Optional, cast
+import platform
+import queue
+import shutil
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
 import numpy as np
 import numpy.typing as npt
-from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.api.types import (
+    Documents,
+    EmbeddingFunction,
+    Embeddings,
+    IDs,
+    Metadata,
+)
+from typing_extensions import TypedDict
+
+from chromadbx.core.instrumentation import instrumented
+from chromadbx.core.ids import generate_documents_sha256_hash
+from chromadbx.embeddings.utils import check_numpy_embeddings
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "chromadbx", "onnx"
+)
+# number of batches buffered between the stages of the pipelined mode
+PIPELINE_QUEUE_SIZE = 2
+# number of batches sorted together by embed_stream() when dynamic padding is enabled
+STREAM_SORT_WINDOW = 32
+
+_PIPELINE_DONE = object()
+
+T = TypeVar("T")
+_Batch = Tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]
+
+
+# hidden size assumed for byte budgets until the real one is known from the model output
+ASSUMED_HIDDEN_SIZE = 1024
+# sequence length assumed for token budgets when the sequences are not truncated
+ASSUMED_MAX_LENGTH = 512
+
+# name of the file holding the weights of models exported for sharing between processes
+EXTERNAL_DATA_FILE = "model.onnx.data"
+# weights are aligned in the external data file so that they can be mapped into arrays without a copy
+EXTERNAL_DATA_ALIGNMENT = 64
+# initializers smaller than this are kept in the model file
+EXTERNAL_DATA_SIZE_THRESHOLD = 1024
+
+
+class _BatchBudget:
+    """
+    The number of padded tokens (batch size x sequence length) per batch.
+
+    The budget is capped by the token and activation byte limits. When a target latency is set it moves towards
+    the number of tokens the host processes within that latency, measured on every batch.
+    """
+
+    def __init__(
+        self,
+        initial_tokens: int,
+        max_tokens: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        target_latency: Optional[float] = None,
+    ):
+        self._tokens = initial_tokens
+        self._max_tokens = max_tokens
+        self._max_bytes = max_bytes
+        self._target_latency = target_latency
+        self._lock = threading.Lock()
+
+    def tokens(self, hidden_size: Optional[int] = None) -> int:
+        caps = [self._tokens]
+        if self._max_tokens is not None:
+            caps.append(self._max_tokens)
+        if self._max_bytes is not None:
+            # the last hidden state (float32) dominates the activations that scale with the batch
+            caps.append(self._max_bytes // (4 * (hidden_size or ASSUMED_HIDDEN_SIZE)))
+        return max(1, min(caps))
+
+    def record(self, tokens: int, seconds: float) -> None:
+        if self._target_latency is None or seconds <= 0:
+            return
+        desired = tokens / seconds * self._target_latency
+        with self._lock:
+            # smooth the update so that a single slow batch does not halve the budget
+            self._tokens = max(1, int(0.5 * self._tokens + 0.5 * desired))
+            if self._max_tokens is not None:
+                self._tokens = min(self._tokens, self._max_tokens)
+
+
+# upper bounds (in seconds) of the stage duration histogram buckets
+STATS_HISTOGRAM_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    float("inf"),
+)
+
+
+class StageRecord(TypedDict):
+    stage: str
+    seconds: float
+    batch_shape: Tuple[int, ...]
+    tokens: int
+    padding_ratio: float
+
+
+class Chunks(TypedDict):
+    """
+    Token-exact chunks of documents with their embeddings, can be passed to `collection.add(**chunks)`.
+    """
+
+    ids: IDs
+    documents: Documents
+    embeddings: Embeddings
+    metadatas: List[Metadata]
+
+
+class OnnxRuntimeStats:
+    """
+    Aggregated per-stage statistics of OnnxRuntimeEmbeddings. The stages are `tokenize`, `infer`, `pool` and `convert`.
+    """
+
+    def __init__(self, callback: Optional[Callable[[StageRecord], None]] = None):
+        """
+        :param callback: Called with the record of every stage execution.
+        """
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, Any]] = {}
+
+    def record(
+        self,
+        stage: str,
+        seconds: float,
+        attention_mask: Optional[npt.NDArray[np.int64]] = None,
+        tokens: Optional[int] = None,
+    ) -> None:
+        if attention_mask is not None:
+            batch_shape: Tuple[int, ...] = attention_mask.shape
+            tokens = int(attention_mask.sum())
+            padded_tokens = attention_mask.size
+        else:
+            batch_shape = ()
+            tokens = tokens or 0
+            padded_tokens = tokens
+        with self._lock:
+            stats = self._stages.setdefault(
+                stage,
+                {
+                    "count": 0,
+                    "seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "tokens": 0,
+                    "padded_tokens": 0,
+                    "histogram": [0] * len(STATS_HISTOGRAM_BUCKETS),
+                },
+            )
+            stats["count"] += 1
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["tokens"] += tokens
+            stats["padded_tokens"] += padded_tokens
+            stats["histogram"][
+                next(i for i, le in enumerate(STATS_HISTOGRAM_BUCKETS) if seconds <= le)
+            ] += 1
+        if self._callback is not None:
+            self._callback(
+                StageRecord(
+                    stage=stage,
+                    seconds=seconds,
+                    batch_shape=batch_shape,
+                    tokens=tokens,
+                    padding_ratio=1 - tokens / padded_tokens if padded_tokens else 0.0,
+                )
+            )
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        :return: Per stage count, total/mean/max seconds, tokens, tokens per second, padding ratio and
+            a histogram of the durations keyed by the bucket upper bound in seconds.
+        """
+        with self._lock:
+            return {
+                stage: {
+                    "count": stats["count"],
+                    "total_seconds": stats["seconds"],
+                    "mean_seconds": stats["seconds"] / stats["count"],
+                    "max_seconds": stats["max_seconds"],
+                    "tokens": stats["tokens"],
+                    "tokens_per_second": stats["tokens"] / stats["seconds"]
+                    if stats["seconds"]
+                    else 0.0,
+                    "padding_ratio": 1 - stats["tokens"] / stats["padded_tokens"]
+                    if stats["padded_tokens"]
+                    else 0.0,
+                    "histogram": dict(zip(STATS_HISTOGRAM_BUCKETS, stats["histogram"])),
+                }
+                for stage, stats in self._stages.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages = {}
+
+
+def _map_weights(model_path: str) -> Dict[str, npt.NDArray[Any]]:
+    """
+    Memory-map the external initializers of a model as read-only arrays. The pages are backed by the file
+    so processes that map the same file, or are forked after mapping it, share one copy of the weights.
+    """
+    import onnx
+    from onnx.helper import tensor_dtype_to_np_dtype
+
+    model = onnx.load(model_path, load_external_data=False)
+    data = np.memmap(
+        os.path.join(os.path.dirname(model_path), EXTERNAL_DATA_FILE),
+        dtype=np.uint8,
+        mode="r",
+    )
+    weights: Dict[str, npt.NDArray[Any]] = {}
+    for tensor in model.graph.initializer:
+        if tensor.data_location != onnx.TensorProto.EXTERNAL:
+            continue
+        info = {entry.key: entry.value for entry in tensor.external_data}
+        offset, length = int(info["offset"]), int(info["length"])
+        weights[tensor.name] = (
+            data[offset : offset + length]
+            .view(tensor_dtype_to_np_dtype(tensor.data_type))
+            .reshape(tuple(tensor.dims))
+        )
+    return weights
+
+
+def _file_sha256(path: str, cache_dir: Optional[str] = None) -> str:
+    """
+    The sha256 digest of a file. Hashing a large model takes seconds, so if `cache_dir` is given the digest is stored
+    there, keyed by the path, size and modification time of the file, and only recomputed when the file changes.
+    """
+    digest_path = None
+    if cache_dir:
+        stat = os.stat(path)
+        key = f"{os.path.realpath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        digest_path = os.path.join(
+            cache_dir, "digests", f"{hashlib.sha256(key.encode()).hexdigest()}.sha256"
+        )
+        try:
+            with open(digest_path) as f:
+                digest = f.read().strip()
+            if len(digest) == 64:
+                return digest
+        except OSError:
+            pass
+    sha256_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256_hash.update(chunk)
+    digest = sha256_hash.hexdigest()
+    if digest_path:
+        try:
+            os.makedirs(os.path.dirname(digest_path), exist_ok=True)
+            # write to a temporary file so that concurrent processes never read a partial digest
+            tmp_digest_path = f"{digest_path}.{os.getpid()}.tmp"
+            with open(tmp_digest_path, "w") as f:
+                f.write(digest)
+            os.replace(tmp_digest_path, digest_path)
+        except OSError:
+            # the digest is only an optimization, a read-only cache directory is not an error
+            logger.debug(f"Could not store the digest of {path} in {cache_dir}")
+    return digest
+
+
+class _Tokens(NamedTuple):
+    """
+    Token ids and attention mask of a sequence that was not produced by the tokenizer, e.g. a chunk of a document.
+    """
+
+    ids: List[int]
+    attention_mask: List[int]
+
+
+def _word_windows(
+    word_ids: Sequence[Optional[int]], capacity: int, overlap: int
+) -> Iterator[Tuple[int, int]]:
+    """
+    Split a sequence of tokens into `(start, end)` windows of at most `capacity` tokens that start and end at word
+    boundaries and share at most `overlap` tokens. Words longer than `capacity` are split.
+    """
+    # the tokens at which a word starts, and the end of the sequence
+    boundaries = [
+        i for i in range(len(word_ids)) if i == 0 or word_ids[i] != word_ids[i - 1]
+    ]
+    boundaries.append(len(word_ids))
+    start = 0
+    while start < len(word_ids):
+        end = boundaries[bisect_right(boundaries, start + capacity) - 1]
+        if end <= start:
+            # a single word longer than the whole window
+            end = start + capacity
+        yield start, end
+        if end == len(word_ids):
+            return
+        # the first boundary after `start` that keeps the overlap within `overlap` tokens
+        start = min(
+            boundaries[bisect_left(boundaries, max(end - overlap, start + 1))], end
+        )
+
+
+class _ModelState:
+    """
+    The tokenizer and the inference sessions of one model. reload() swaps the whole state at once,
+    calls that are already in flight keep using the state they started with.
+    """
+
+    def __init__(
+        self,
+        local_model_path: str,
+        model_path: str,
+        version: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+    ):
+        self.local_model_path = local_model_path
+        self.model_path = model_path
+        self.version = version
+        # where the digest of the model file is cached across processes
+        self.cache_dir = cache_dir
+        self.sha256: Optional[str] = None
+        self.tokenizer: Optional["Tokenizer"] = None  # type: ignore # noqa: F821
+        self.pad_id = 0
+        self.sessions: List["InferenceSession"] = []  # type: ignore # noqa: F821
+        self.idle_sessions: "queue.Queue[InferenceSession]" = queue.Queue()  # type: ignore # noqa: F821
+        self.input_names: List[str] = []
+        self.output_name: Optional[str] = None
+        self.hidden_size: Optional[int] = None
+        # the process the sessions were created in, sessions must not be used after a fork
+        self.pid: Optional[int] = None
+        self.weights: Optional[Dict[str, "OrtValue"]] = None  # type: ignore # noqa: F821
+        # the tokenizer that tokenizes whole documents for chunking, without truncation and special tokens
+        self.chunk_tokenizer: Optional["Tokenizer"] = None  # type: ignore # noqa: F821
+
+    def model_sha256(self) -> str:
+        if self.sha256 is None:
+            self.sha256 = _file_sha256(self.model_path, self.cache_dir)
+        return self.sha256
+
+    def model_version(self) -> str:
+        if self.version is None:
+            self.version = self.model_sha256()[:12]
+        return self.version
+
 
 class OnnxRuntimeEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
     """
@@ -25,6 +398,25 @@ class OnnxRuntimeEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
         enabled_padding: Optional[bool] = True,
         hf_download: Optional[bool] = False,
         model_cache_dir: Optional[str] = None,
+        dynamic_padding: Optional[bool] = False,
+        intra_op_num_threads: Optional[int] = None,
+        inter_op_num_threads: Optional[int] = None,
+        parallel_execution: Optional[bool] = False,
+        num_sessions: Optional[int] = 1,
+        quantized: Optional[bool] = False,
+        return_numpy: Optional[bool] = False,
+        pipelined: Optional[bool] = False,
+        cache_optimized_model: Optional[bool] = False,
+        io_binding: Optional[bool] = False,
+        output_dimensions: Optional[int] = None,
+        batch_size: Optional[int] = 32,
+        max_batch_tokens: Optional[int] = None,
+        max_batch_bytes: Optional[int] = None,
+        target_batch_latency: Optional[float] = None,
+        profiling: Optional[bool] = False,
+        profiling_callback: Optional[Callable[[StageRecord], None]] = None,
+        ort_profiling_dir: Optional[str] = None,
+        shared_weights: Optional[bool] = False,
     ):
         """
         Initialize the OnnxRuntimeEmbeddings.
@@ -34,6 +426,41 @@ class OnnxRuntimeEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
         :param max_length: The maximum length of the input sequence. Default is 256.
         :param enabled_padding: Whether to enable padding. Default is True.
         :param hf_download: Whether to download the model from HuggingFace repository. Default is False.
+        :param model_cache_dir: The directory where derived models (e.g. quantized copies) are cached. Default is ~/.cache/chromadbx/onnx.
+        :param dynamic_padding: Whether to sort the input by token length and pad each batch only to its longest sequence
+            instead of padding every document to `max_length`. Embeddings are returned in the original input order. Default is False.
+        :param intra_op_num_threads: The number of threads ONNX Runtime uses to parallelize a single operator. Default is None (ONNX Runtime default).
+        :param inter_op_num_threads: The number of threads ONNX Runtime uses to run independent operators in parallel.
+            Only used with `parallel_execution`. Default is None (ONNX Runtime default).
+        :param parallel_execution: Whether to run independent graph nodes in parallel (ORT_PARALLEL execution mode). Default is False.
+        :param num_sessions: The number of inference sessions to run batches on concurrently. When more than one session is used
+            consider lowering `intra_op_num_threads` so that the sessions do not compete for the same cores. Default is 1.
+        :param quantized: Whether to use an INT8 quantized model (model_quantized.onnx or model_int8.onnx). If the model has no
+            quantized variant a dynamically quantized copy of the fp32 model is created and cached in `model_cache_dir`. Default is False.
+        :param return_numpy: Whether to return the embeddings as float32 numpy rows of one matrix instead of lists.
+            Requires chromadb 0.5.11 or later. Default is False.
+        :param pipelined: Whether to run tokenization, inference and pooling of consecutive batches concurrently in separate
+            threads. Cannot be combined with `io_binding`. Default is False.
+        :param cache_optimized_model: Whether to save the graph optimized by ONNX Runtime in `model_cache_dir` and load it
+            on the next start instead of optimizing the model again. Default is False.
+        :param io_binding: Whether to bind the inputs and a reused output buffer to the session to avoid copying the output
+            of every batch. Cannot be combined with `pipelined`. Default is False.
+        :param output_dimensions: The number of leading dimensions to keep for Matryoshka models. The truncated embeddings
+            are normalized again. Default is None (the full hidden size).
+        :param batch_size: The number of documents per batch when no batch budget is set. Default is 32.
+        :param max_batch_tokens: The maximum number of padded tokens (batch size x sequence length) per batch.
+            Default is None (no limit).
+        :param max_batch_bytes: The maximum size in bytes of the last hidden state of a batch, which bounds the memory
+            used by the activations. Default is None (no limit).
+        :param target_batch_latency: The target duration of a batch in seconds. The number of tokens per batch is adapted
+            to the measured throughput, capped by `max_batch_tokens` and `max_batch_bytes`. Default is None (no target).
+        :param profiling: Whether to collect per-stage timings and padding statistics in `stats`. Default is False.
+        :param profiling_callback: Called with a `StageRecord` after every stage execution, enables `profiling`.
+            Default is None.
+        :param ort_profiling_dir: The directory where the ONNX Runtime profiler writes its traces, see `end_ort_profiling()`.
+            Default is None (the profiler is disabled).
+        :param shared_weights: Whether to export the model weights to an external data file in `model_cache_dir` and memory-map them,
+            so that processes forked after preload() share one copy of the weights. Default is False.
         """
         if preferred_providers and not all(
             [isinstance(i, str) for i in preferred_providers]
@@ -44,20 +471,30 @@ class OnnxRuntimeEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
             set(preferred_providers)
         ):
             raise ValueError("Preferred providers must be unique")
+        if num_sessions is not None and num_sessions < 1:
+            raise ValueError("Number of sessions must be at least 1")
+        if output_dimensions is not None and output_dimensions < 1:
+            raise ValueError("Output dimensions must be at least 1")
+        if batch_size is not None and batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+        if io_binding and pipelined:
+            # the pooling stage would read the output buffer while the inference stage overwrites it
+            raise ValueError("IO binding cannot be combined with the pipelined mode")
+        if shared_weights and cache_optimized_model:
+            # the optimized graph is saved with the weights embedded
+            raise ValueError(
+                "Shared weights cannot be combined with caching the optimized model"
+            )
         self._preferred_providers = preferred_providers
-        self._local_model_path = os.path.expanduser(model_path)
-        if hf_download:
-            try:
-                from huggingface_hub import snapshot_download
-            except ImportError:
-                raise ValueError(
-                    "The `huggingface_hub` python package is not installed. "
-                    "Please install it with `pip install huggingface_hub`"
-                )
-            self._local_model_path = snapshot_download(repo_id=model_path)
-        self._actual_model_path = self._find_onnx_model(self._local_model_path)
-        self._max_length = max_length
-        self._enabled_padding = enabled_padding
+        self._model_cache_dir = os.path.expanduser(
+            model_cache_dir or DEFAULT_MODEL_CACHE_DIR
+        )
+        self._quantized = quantized
+        check_numpy_embeddings(return_numpy)
+        self._return_numpy = return_numpy
+        self._pipelined = pipelined
+        self._cache_optimized_model = cache_optimized_model
+        # check the dependencies before the model is resolved, which may download or quantize it
         try:
             # Equivalent to import onnxruntime
             self.ort = importlib.import_module("onnxruntime")
@@ -71,6 +508,69 @@ class OnnxRuntimeEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
             raise ValueError(
                 "The tokenizers python package is not installed. Please install it with `pip install tokenizers`"
             )
+        self._state = self._resolve_model(model_path, hf_download)
+        self._max_length = max_length
+        self._enabled_padding = enabled_padding
+        self._dynamic_padding = dynamic_padding
+        self._intra_op_num_threads = intra_op_num_threads
+        self._inter_op_num_threads = inter_op_num_threads
+        self._parallel_execution = parallel_execution
+        self._num_sessions = num_sessions or 1
+        # guards the lazy creation of the tokenizer and the sessions which may be requested from many threads at once
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._io_binding = io_binding
+        self._output_dimensions = output_dimensions
+        self._batch_size = batch_size or 32
+        self._batch_budget: Optional[_BatchBudget] = None
+        if max_batch_tokens or max_batch_bytes or target_batch_latency:
+            self._batch_budget = _BatchBudget(
+                initial_tokens=max_batch_tokens
+                or self._batch_size * (max_length or ASSUMED_MAX_LENGTH),
+                max_tokens=max_batch_tokens,
+                max_bytes=max_batch_bytes,
+                target_latency=target_batch_latency,
+            )
+        self._buffers = threading.local()
+        self.stats: Optional[OnnxRuntimeStats] = None
+        if profiling or profiling_callback:
+            self.stats = OnnxRuntimeStats(callback=profiling_callback)
+        self._ort_profiling_dir = ort_profiling_dir
+        self._shared_weights = shared_weights
+
+    def _resolve_model(
+        self,
+        model_path: str,
+        hf_download: Optional[bool] = False,
+        version: Optional[str] = None,
+    ) -> _ModelState:
+        local_model_path = os.path.expanduser(model_path)
+        if hf_download:
+            try:
+                from huggingface_hub import snapshot_download
+            except ImportError:
+                raise ValueError(
+                    "The `huggingface_hub` python package is not installed. "
+                    "Please install it with `pip install huggingface_hub`"
+                )
+            local_model_path = snapshot_download(repo_id=model_path)
+        if self._quantized:
+            actual_model_path = self._find_quantized_onnx_model(
+                local_model_path, self._model_cache_dir
+            )
+        else:
+            actual_model_path = self._find_onnx_model(local_model_path)
+        return _ModelState(
+            local_model_path, actual_model_path, version, self._model_cache_dir
+        )
+
+    @property
+    def _local_model_path(self) -> str:
+        return self._state.local_model_path
+
+    @property
+    def _actual_model_path(self) -> str:
+        return self._state.model_path
 
     @staticmethod
     def _find_onnx_model(model_path: str) -> str:
@@ -92,6 +592,82 @@ class OnnxRuntimeEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
             )
         return _actual_model_path
 
+    @staticmethod
+    def _find_quantized_onnx_model(model_path: str, cache_dir: str) -> str:
+        _model_paths = [
+            os.path.join(model_path, "model_quantized.onnx"),
+            os.path.join(model_path, "model_int8.onnx"),
+            os.path.join(model_path, "onnx", "model_quantized.onnx"),
+            os.path.join(model_path, "onnx", "model_int8.onnx"),
+        ]
+        for mp in _model_paths:
+            if os.path.exists(mp):
+                return mp
+        fp32_model_path = OnnxRuntimeEmbeddings._find_onnx_model(model_path)
+        quantized_model_path = os.path.join(
+            cache_dir, f"{_file_sha256(fp32_model_path, cache_dir)}_int8.onnx"
+        )
+        if os.path.exists(quantized_model_path):
+            return quantized_model_path
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except ImportError:
+            raise ValueError(
+                "The onnx python package is required to quantize the model. Please install it with `pip install onnx`"
+            )
+        logger.info(
+            f"No quantized model found in {model_path}, quantizing {fp32_model_path} to {quantized_model_path}"
+        )
+        os.makedirs(cache_dir, exist_ok=True)
+        # quantize into a temporary file so that concurrent processes never load a partially written model
+        tmp_model_path = f"{quantized_model_path}.{os.getpid()}.tmp"
+        quantize_dynamic(fp32_model_path, tmp_model_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_model_path, quantized_model_path)
+        return quantized_model_path
+
+    @staticmethod
+    def _find_external_data_model(model_path: str, cache_dir: str) -> str:
+        export_dir = os.path.join(
+            cache_dir, f"{_file_sha256(model_path, cache_dir)}_external"
+        )
+        export_path = os.path.join(export_dir, "model.onnx")
+        if os.path.exists(export_path):
+            return export_path
+        try:
+            import onnx
+            from onnx.external_data_helper import set_external_data
+        except ImportError:
+            raise ValueError(
+                "The onnx python package is required to share the model weights. Please install it with `pip install onnx`"
+            )
+        logger.info(f"Exporting the weights of {model_path} to {export_dir}")
+        model = onnx.load(model_path)
+        # export into a temporary directory so that concurrent processes never load a partially written model
+        tmp_dir = f"{export_dir}.{os.getpid()}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        with open(os.path.join(tmp_dir, EXTERNAL_DATA_FILE), "wb") as f:
+            for tensor in model.graph.initializer:
+                if (
+                    not tensor.HasField("raw_data")
+                    or len(tensor.raw_data) < EXTERNAL_DATA_SIZE_THRESHOLD
+                ):
+                    continue
+                f.write(b"\0" * (-f.tell() % EXTERNAL_DATA_ALIGNMENT))
+                offset = f.tell()
+                f.write(tensor.raw_data)
+                set_external_data(
+                    tensor, EXTERNAL_DATA_FILE, offset, len(tensor.raw_data)
+                )
+                tensor.ClearField("raw_data")
+                tensor.data_location = onnx.TensorProto.EXTERNAL
+        onnx.save_model(model, os.path.join(tmp_dir, "model.onnx"))
+        try:
+            os.replace(tmp_dir, export_dir)
+        except OSError:
+            # another process exported the model first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return export_path
+
     # Use pytorches default epsilon for division by zero
     # https://pytorch.org/docs/stable/generated/torch.nn.functional.normalize.html
     def _normalize(self, v: npt.NDArray[np.float32]) -> npt.NDArray[np.float32]:
@@ -99,55 +675,604 @@ class OnnxRuntimeEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
         norm[norm == 0] = 1e-12
         return cast(npt.NDArray[np.float32], v / norm[:, np.newaxis])
 
+    @staticmethod
+    def _pad(
+        encoded: List["Encoding"], pad_id: int = 0  # type: ignore # noqa: F821
+    ) -> _Batch:
+        """
+        Pad a batch of encodings to the length of its longest sequence.
+        """
+        max_len = max(len(e.ids) for e in encoded)
+        input_ids = np.full((len(encoded), max_len), pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(encoded), max_len), dtype=np.int64)
+        for row, e in enumerate(encoded):
+            input_ids[row, : len(e.ids)] = e.ids
+            attention_mask[row, : len(e.ids)] = e.attention_mask
+        return input_ids, attention_mask
+
+    def _infer(
+        self,
+        input_ids: npt.NDArray[np.int64],
+        attention_mask: npt.NDArray[np.int64],
+        session: Optional["InferenceSession"] = None,  # type: ignore # noqa: F821
+        state: Optional[_ModelState] = None,
+    ) -> Tuple[npt.NDArray[np.float32], npt.NDArray[np.int64]]:
+        state = state or self._state
+        session = session or self._get_sessions(state)[0]
+        if self._batch_budget is None and self.stats is None:
+            if self._io_binding:
+                return self._infer_bound(input_ids, attention_mask, session, state)
+            return self._infer_unbound(input_ids, attention_mask, session, state)
+        start = time.perf_counter()
+        if self._io_binding:
+            result = self._infer_bound(input_ids, attention_mask, session, state)
+        else:
+            result = self._infer_unbound(input_ids, attention_mask, session, state)
+        elapsed = time.perf_counter() - start
+        if self._batch_budget is not None:
+            self._batch_budget.record(input_ids.size, elapsed)
+        if self.stats is not None:
+            self.stats.record("infer", elapsed, attention_mask)
+        return result
+
+    def _buffer(
+        self, name: str, shape: Tuple[int, ...], dtype: "npt.DTypeLike"
+    ) -> npt.NDArray[Any]:
+        """
+        Return a view of shape `shape` into a per-thread buffer that only grows when a larger shape is requested.
+        The buffer is zeroed when it is allocated but not when it is reused, so the view holds whatever the previous
+        batch on this thread left in it. Callers must either overwrite it completely or never write to it.
+        """
+        buffers = getattr(self._buffers, "buffers", None)
+        if buffers is None:
+            buffers = self._buffers.buffers = {}
+        size = int(np.prod(shape))
+        buffer = buffers.get(name)
+        if buffer is None or buffer.size < size:
+            buffer = buffers[name] = np.zeros(size, dtype=dtype)
+        return cast(npt.NDArray[Any], buffer[:size].reshape(shape))
+
+    def _infer_bound(
+        self,
+        input_ids: npt.NDArray[np.int64],
+        attention_mask: npt.NDArray[np.int64],
+        session: "InferenceSession",  # type: ignore # noqa: F821
+        state: _ModelState,
+    ) -> Tuple[npt.NDArray[np.float32], npt.NDArray[np.int64]]:
+        if state.hidden_size is None:
+            # the hidden size is a symbolic dimension in some models, learn it from the first batch
+            return self._infer_unbound(input_ids, attention_mask, session, state)
+        binding = session.io_binding()
+        # the inputs are bound in place, they are not copied into reused buffers as they are built by the
+        # caller and several of them can be in flight on the session pool at the same time
+        binding.bind_cpu_input("input_ids", input_ids)
+        binding.bind_cpu_input("attention_mask", attention_mask)
+        if "token_type_ids" in state.input_names:
+            # the buffer is never written to, so it stays all zeros
+            binding.bind_cpu_input(
+                "token_type_ids",
+                self._buffer("token_type_ids", input_ids.shape, np.int64),
+            )
+        # the output is written in place, it is only valid until the next batch runs on this thread
+        last_hidden_state = self._buffer(
+            "last_hidden_state", (*input_ids.shape, state.hidden_size), np.float32
+        )
+        binding.bind_output(
+            state.output_name,
+            "cpu",
+            0,
+            np.float32,
+            last_hidden_state.shape,
+            last_hidden_state.ctypes.data,
+        )
+        session.run_with_iobinding(binding)
+        return last_hidden_state, attention_mask
+
+    def _infer_unbound(
+        self,
+        input_ids: npt.NDArray[np.int64],
+        attention_mask: npt.NDArray[np.int64],
+        session: "InferenceSession",  # type: ignore # noqa: F821
+        state: _ModelState,
+    ) -> Tuple[npt.NDArray[np.float32], npt.NDArray[np.int64]]:
+        onnx_input = {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+        }
+        if "token_type_ids" in state.input_names:
+            onnx_input["token_type_ids"] = np.zeros_like(input_ids)
+        model_output = session.run(None, onnx_input)
+        if state.hidden_size is None:
+            state.hidden_size = model_output[0].shape[-1]
+        return model_output[0], attention_mask
+
+    def _pool(
+        self,
+        last_hidden_state: npt.NDArray[np.float32],
+        attention_mask: npt.NDArray[np.int64],
+    ) -> npt.NDArray[np.float32]:
+        start = time.perf_counter() if self.stats is not None else 0.0
+        # Perform mean pooling with attention weighting, the masked sum is a batched (1 x seq) @ (seq x hidden)
+        # matrix product which avoids materializing the expanded mask and the masked hidden states
+        mask = attention_mask.astype(np.float32)
+        embeddings: npt.NDArray[np.float32] = np.matmul(
+            mask[:, np.newaxis, :], last_hidden_state
+        )[:, 0, :]
+        embeddings /= np.clip(mask.sum(1, keepdims=True), a_min=1e-9, a_max=None)
+        if self._output_dimensions:
+            hidden_size = np.shape(embeddings)[1]
+            if self._output_dimensions > hidden_size:
+                raise ValueError(
+                    f"Output dimensions {self._output_dimensions} exceed the model hidden size {hidden_size}"
+                )
+            # Matryoshka truncation, normalization below renormalizes the shortened vectors
+            embeddings = embeddings[:, : self._output_dimensions]
+        embeddings = self._normalize(embeddings)
+        if self.stats is not None:
+            self.stats.record("pool", time.perf_counter() - start, attention_mask)
+        return embeddings
+
+    def _run(
+        self,
+        input_ids: npt.NDArray[np.int64],
+        attention_mask: npt.NDArray[np.int64],
+        session: Optional["InferenceSession"] = None,  # type: ignore # noqa: F821
+        state: Optional[_ModelState] = None,
+    ) -> npt.NDArray[np.float32]:
+        return self._pool(
+            *self._infer(input_ids, attention_mask, session=session, state=state)
+        )
+
+    def _run_pooled(self, fn: Callable[..., T], batch: _Batch, state: _ModelState) -> T:
+        # each session runs one batch at a time, batches wait here for the next idle session
+        session = state.idle_sessions.get()
+        try:
+            return fn(*batch, session=session, state=state)
+        finally:
+            state.idle_sessions.put(session)
+
+    def _map(
+        self, fn: Callable[..., T], batches: Iterable[_Batch], state: _ModelState
+    ) -> Iterator[T]:
+        """
+        Apply `fn` to the batches on the session pool of `state` and yield the results in batch order.
+        """
+        if self._num_sessions == 1:
+            yield from (fn(*batch, state=state) for batch in batches)
+            return
+        self._get_sessions(state)
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self._num_sessions,
+                        thread_name_prefix="onnx-embeddings",
+                    )
+        # Executor.map() submits everything upfront, keep a bounded number of batches in flight instead
+        pending: Deque["Future[T]"] = deque()
+
+        def run(batch: _Batch) -> T:
+            return self._run_pooled(fn, batch, state)
+
+        for batch in batches:
+            pending.append(self._executor.submit(run, batch))
+            if len(pending) >= 2 * self._num_sessions:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def _pipeline(
+        self, batches: Iterable[_Batch], state: _ModelState
+    ) -> Iterator[npt.NDArray[np.float32]]:
+        """
+        Run tokenization, inference and pooling as concurrent stages connected by bounded queues.
+        Tokenization happens in a producer thread that consumes `batches`, inference in a second thread
+        and pooling and normalization in the calling thread.
+        """
+        tokenized: "queue.Queue[Any]" = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        inferred: "queue.Queue[Any]" = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        stop = threading.Event()
+
+        def put(q: "queue.Queue[Any]", item: Any) -> None:
+            # give up when the consumer has stopped, otherwise the stage would block forever on a full queue
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def drain(q: "queue.Queue[Any]") -> Iterator[Any]:
+            while True:
+                try:
+                    item = q.get(timeout=0.1)
+                except queue.Empty:
+                    # the producer gives up without a sentinel when the consumer has stopped
+                    if stop.is_set():
+                        return
+                    continue
+                if item is _PIPELINE_DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+
+        def stage(source: Iterable[Any], q: "queue.Queue[Any]") -> None:
+            try:
+                for item in source:
+                    if stop.is_set():
+                        return
+                    put(q, item)
+            except BaseException as e:
+                put(q, e)
+            finally:
+                put(q, _PIPELINE_DONE)
+
+        threads = [
+            threading.Thread(
+                target=stage, args=(batches, tokenized), name="onnx-tokenize"
+            ),
+            threading.Thread(
+                target=stage,
+                args=(self._map(self._infer, drain(tokenized), state), inferred),
+                name="onnx-infer",
+            ),
+        ]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        try:
+            for last_hidden_state, attention_mask in drain(inferred):
+                yield self._pool(last_hidden_state, attention_mask)
+        finally:
+            stop.set()
+
+    def _execute(
+        self, batches: Iterable[_Batch], state: _ModelState
+    ) -> Iterator[npt.NDArray[np.float32]]:
+        if self._pipelined:
+            return self._pipeline(batches, state)
+        return self._map(self._run, batches, state)
+
+    @staticmethod
+    def _collect(
+        batches: Iterable[npt.NDArray[np.float32]],
+        size: int,
+        order: Optional[npt.NDArray[np.intp]] = None,
+    ) -> npt.NDArray[np.float32]:
+        """
+        Write the batch embeddings into a single preallocated array, scattering them back to the input order if `order` is given.
+        """
+        embeddings: Optional[npt.NDArray[np.float32]] = None
+        offset = 0
+        for batch in batches:
+            if embeddings is None:
+                embeddings = np.empty((size, np.shape(batch)[1]), dtype=np.float32)
+            if order is None:
+                embeddings[offset : offset + len(batch)] = batch
+            else:
+                embeddings[order[offset : offset + len(batch)]] = batch
+            offset += len(batch)
+        if embeddings is None:
+            raise ValueError("No documents to embed")
+        return embeddings
+
+    def _plan_batches(
+        self,
+        lengths: Sequence[int],
+        batch_size: Optional[int] = None,
+        hidden_size: Optional[int] = None,
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        Split documents sorted by ascending sequence length into `(start, end)` batches.
+        The last document of a batch determines its padded length.
+        """
+        start = 0
+        while start < len(lengths):
+            if self._batch_budget is None:
+                end = start + (batch_size or self._batch_size)
+            else:
+                # the budget is read for every batch as the latency feedback may change it between batches
+                budget = self._batch_budget.tokens(hidden_size)
+                end = start + 1
+                while end < len(lengths) and (end + 1 - start) * lengths[end] <= budget:
+                    end += 1
+            yield start, min(end, len(lengths))
+            start = end
+
+    def _fixed_length_batch_size(
+        self, batch_size: Optional[int] = None, hidden_size: Optional[int] = None
+    ) -> int:
+        """
+        The size of the next batch when every sequence is padded to `max_length`.
+        """
+        if self._batch_budget is None:
+            return batch_size or self._batch_size
+        return max(
+            1,
+            self._batch_budget.tokens(hidden_size)
+            // (self._max_length or ASSUMED_MAX_LENGTH),
+        )
+
     def _forward(
-        self, documents: List[str], batch_size: int = 32
+        self,
+        documents: List[str],
+        batch_size: Optional[int] = None,
+        state: Optional[_ModelState] = None,
+    ) -> npt.NDArray[np.float32]:
+        model_state = state or self._state
+        if self._dynamic_padding:
+            return self._forward_dynamic(documents, batch_size, model_state)
+
+        def batches() -> Iterator[_Batch]:
+            start = 0
+            while start < len(documents):
+                end = start + self._fixed_length_batch_size(
+                    batch_size, model_state.hidden_size
+                )
+                yield self._encode(documents[start:end], model_state)
+                start = end
+
+        return self._collect(self._execute(batches(), model_state), len(documents))
+
+    def _encode(self, batch: List[str], state: Optional[_ModelState] = None) -> _Batch:
+        start = time.perf_counter() if self.stats is not None else 0.0
+        encoded = self._get_tokenizer(state or self._state).encode_batch(batch)  # type: ignore[attr-defined]
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        if self.stats is not None:
+            self.stats.record("tokenize", time.perf_counter() - start, attention_mask)
+        return input_ids, attention_mask
+
+    def _forward_dynamic(
+        self,
+        documents: List[str],
+        batch_size: Optional[int],
+        state: _ModelState,
+    ) -> npt.NDArray[np.float32]:
+        start = time.perf_counter() if self.stats is not None else 0.0
+        encoded = self._get_tokenizer(state).encode_batch(documents)  # type: ignore[attr-defined]
+        return self._forward_encoded(encoded, batch_size, state, start)
+
+    def _forward_encoded(
+        self,
+        encoded: List["Encoding"],  # type: ignore # noqa: F821
+        batch_size: Optional[int],
+        state: _ModelState,
+        start: float = 0.0,
     ) -> npt.NDArray[np.float32]:
-        all_embeddings = []
-        for i in range(0, len(documents), batch_size):
-            input_names = [input.name for input in self.model.get_inputs()]
-            batch = documents[i : i + batch_size]
-            encoded = [self.tokenizer.encode(d) for d in batch]  # type: ignore[attr-defined]
-            input_ids = np.array([e.ids for e in encoded])
-            attention_mask = np.array([e.attention_mask for e in encoded])
-            onnx_input = {
-                "input_ids": np.array(input_ids, dtype=np.int64),
-                "attention_mask": np.array(attention_mask, dtype=np.int64),
-                "token_type_ids": np.array(
-                    [np.zeros(len(e), dtype=np.int64) for e in input_ids],
-                    dtype=np.int64,
+        # sorting by length groups similarly sized documents in the same batch which minimizes padding
+        order = np.argsort([len(e.ids) for e in encoded], kind="stable")
+        lengths = [len(encoded[i].ids) for i in order]
+        if self.stats is not None:
+            self.stats.record(
+                "tokenize", time.perf_counter() - start, tokens=sum(lengths)
+            )
+        return self._collect(
+            self._execute(
+                (
+                    self._pad([encoded[j] for j in order[start:end]], state.pad_id)
+                    for start, end in self._plan_batches(
+                        lengths, batch_size, state.hidden_size
+                    )
                 ),
-            }
-            if "token_type_ids" not in input_names:
-                del onnx_input["token_type_ids"]
-            model_output = self.model.run(None, onnx_input)
-            last_hidden_state = model_output[0]
-            # Perform mean pooling with attention weighting
-            input_mask_expanded = np.broadcast_to(
-                np.expand_dims(attention_mask, -1), last_hidden_state.shape
-            )
-            embeddings = np.sum(last_hidden_state * input_mask_expanded, 1) / np.clip(
-                input_mask_expanded.sum(1), a_min=1e-9, a_max=None
-            )
-            embeddings = self._normalize(embeddings).astype(np.float32)
-            all_embeddings.append(embeddings)
-        return np.concatenate(all_embeddings)
-
-    @cached_property
+                state,
+            ),
+            len(encoded),
+            order,
+        )
+
+    def embed_stream(
+        self, documents: Iterable[str], batch_size: Optional[int] = None
+    ) -> Iterator[Tuple[int, npt.NDArray[np.float32]]]:
+        """
+        Lazily embed documents from any iterable, e.g. a generator reading a corpus that does not fit in memory.
+        Only a bounded number of batches is held in memory at any time.
+
+        :param documents: The documents to embed.
+        :param batch_size: The number of documents per batch when no batch budget is set. Default is the `batch_size` of the embedding function.
+        :return: An iterator of `(offset, embeddings)` tuples where `offset` is the position of the first document of the chunk in the input.
+
+        Example:
+            >>> ef = OnnxRuntimeEmbeddings(model_path="snowflake/arctic-embed-s", hf_download=True)
+            >>> for offset, embeddings in ef.embed_stream(open("corpus.txt")):
+            ...     col.add(ids=[f"{offset + i}" for i in range(len(embeddings))], embeddings=embeddings)
+        """
+        it = iter(documents)
+        offset = 0
+        batch_size = batch_size or self._batch_size
+        # the whole stream is embedded with the same model even if it is reloaded in the meantime
+        state = self._state
+        if self._dynamic_padding:
+            # documents are only sorted by length within a window of batches so that the memory stays bounded
+            while window := list(islice(it, batch_size * STREAM_SORT_WINDOW)):
+                yield offset, self._forward_dynamic(window, batch_size, state)
+                offset += len(window)
+            return
+
+        def batches() -> Iterator[_Batch]:
+            while True:
+                # read one batch at a time so that the batch budget is applied as it changes
+                size = self._fixed_length_batch_size(batch_size, state.hidden_size)
+                batch = list(islice(it, size))
+                if not batch:
+                    return
+                yield self._encode(batch, state)
+
+        for embeddings in self._execute(batches(), state):
+            yield offset, embeddings
+            offset += len(embeddings)
+
+    def chunk(
+        self,
+        documents: Documents,
+        *,
+        ids: Optional[IDs] = None,
+        chunk_size: Optional[int] = None,
+        overlap: int = 32,
+        batch_size: Optional[int] = None,
+    ) -> Chunks:
+        """
+        Split documents into overlapping, token-exact chunks with the model tokenizer and embed them.
+        Documents are tokenized once, the token ids of the chunks are passed to the model as they are.
+        Chunks start and end at word boundaries, only words longer than a whole chunk are split.
+
+        :param documents: The documents to split.
+        :param ids: The ids of the documents, chunk ids are `<document id>-<chunk number>`. Default is the SHA-256 of each document.
+            Repeated document ids also get the position of the document in the input, `<document id>-<position>-<chunk number>`.
+        :param chunk_size: The maximum number of tokens per chunk, including special tokens. Default is `max_length` (or 512 when not set).
+        :param overlap: The maximum number of tokens shared by consecutive chunks. Default is 32.
+        :param batch_size: The number of chunks per batch when no batch budget is set. Default is the `batch_size` of the embedding function.
+        :return: The chunk ids, texts, embeddings and metadatas with the document id, the chunk number and the `start`/`end`
+            character offsets of the chunk in the document.
+
+        Example:
+            >>> ef = OnnxRuntimeEmbeddings(model_path="snowflake/arctic-embed-s", hf_download=True)
+            >>> col.add(**ef.chunk(long_documents, chunk_size=128, overlap=16))
+        """
+        chunk_size = chunk_size or self._max_length or ASSUMED_MAX_LENGTH
+        if overlap < 0 or overlap >= chunk_size:
+            raise ValueError("Overlap must be between 0 and the chunk size")
+        if ids is not None and len(ids) != len(documents):
+            raise ValueError("The number of ids must match the number of documents")
+        document_ids = (
+            list(ids) if ids is not None else generate_documents_sha256_hash(documents)
+        )
+        state = self._state
+        start = time.perf_counter() if self.stats is not None else 0.0
+        tokenizer = self._get_chunk_tokenizer(state)
+        prefix, suffix = self._special_tokens(tokenizer)
+        capacity = chunk_size - len(prefix) - len(suffix)
+        if capacity < 1:
+            raise ValueError(
+                f"The chunk size must be larger than the {len(prefix) + len(suffix)} special tokens"
+            )
+        chunks: Chunks = {"ids": [], "documents": [], "embeddings": [], "metadatas": []}
+        encoded: List[_Tokens] = []
+        encodings = tokenizer.encode_batch(documents, add_special_tokens=False)  # type: ignore[attr-defined]
+        seen = set()
+        for position, (document, document_id, encoding) in enumerate(
+            zip(documents, document_ids, encodings)
+        ):
+            id_prefix = (
+                f"{document_id}-{position}" if document_id in seen else document_id
+            )
+            seen.add(document_id)
+            for chunk_number, (chunk_start, chunk_end) in enumerate(
+                _word_windows(encoding.word_ids, capacity, overlap)
+            ):
+                span_start = encoding.offsets[chunk_start][0]
+                span_end = encoding.offsets[chunk_end - 1][1]
+                chunks["ids"].append(f"{id_prefix}-{chunk_number}")
+                chunks["documents"].append(document[span_start:span_end])
+                chunks["metadatas"].append(
+                    {
+                        "document_id": document_id,
+                        "chunk": chunk_number,
+                        "start": span_start,
+                        "end": span_end,
+                    }
+                )
+                token_ids = prefix + encoding.ids[chunk_start:chunk_end] + suffix
+                encoded.append(_Tokens(token_ids, [1] * len(token_ids)))
+        if not encoded:
+            # only empty documents
+            return chunks
+        chunks["embeddings"] = self._convert(
+            self._forward_encoded(encoded, batch_size, state, start)
+        )
+        return chunks
+
+    @staticmethod
+    def _special_tokens(
+        tokenizer: "Tokenizer",  # type: ignore # noqa: F821
+    ) -> Tuple[List[int], List[int]]:
+        """
+        The ids of the special tokens the tokenizer adds before and after a single sequence, e.g. [CLS] and [SEP].
+        """
+        encoding = tokenizer.encode("a", add_special_tokens=True)  # type: ignore[attr-defined]
+        mask = encoding.special_tokens_mask
+        content = [i for i, special in enumerate(mask) if not special]
+        if not content:
+            return [], []
+        return encoding.ids[: content[0]], encoding.ids[content[-1] + 1 :]
+
+    def _get_chunk_tokenizer(self, state: _ModelState) -> "Tokenizer":  # type: ignore # noqa: F821
+        if state.chunk_tokenizer is None:
+            model_tokenizer = self._get_tokenizer(state)
+            with self._lock:
+                if state.chunk_tokenizer is None:
+                    # a copy of the model tokenizer, truncation and padding settings are global to a tokenizer
+                    tokenizer = self.Tokenizer.from_str(model_tokenizer.to_str())  # type: ignore[attr-defined]
+                    if tokenizer.padding:
+                        state.pad_id = tokenizer.padding["pad_id"]
+                    tokenizer.no_padding()
+                    tokenizer.no_truncation()
+                    state.chunk_tokenizer = tokenizer
+        return state.chunk_tokenizer  # type: ignore[no-any-return]
+
+    @property
     def tokenizer(self) -> "Tokenizer":  # type: ignore # noqa: F821
+        return self._get_tokenizer(self._state)
+
+    def _get_tokenizer(self, state: _ModelState) -> "Tokenizer":  # type: ignore # noqa: F821
+        if state.tokenizer is None:
+            with self._lock:
+                if state.tokenizer is None:
+                    state.tokenizer = self._load_tokenizer(state)
+        return state.tokenizer  # type: ignore[no-any-return]
+
+    def _load_tokenizer(self, state: _ModelState) -> "Tokenizer":  # type: ignore # noqa: F821
         # TODO is this brittle? Can tokenizer.json be in different place?
         tokenizer = self.Tokenizer.from_file(
-            os.path.join(self._local_model_path, "tokenizer.json")
+            os.path.join(state.local_model_path, "tokenizer.json")
         )
         if self._max_length:
             tokenizer.enable_truncation(max_length=self._max_length)
-        if self._enabled_padding:
+        if self._dynamic_padding:
+            # padding is applied per batch in _forward_dynamic
+            if tokenizer.padding:
+                state.pad_id = tokenizer.padding["pad_id"]
+            tokenizer.no_padding()
+        elif self._enabled_padding:
             tokenizer.enable_padding(length=self._max_length)
         # tokenizer.enable_truncation(max_length=256)
         # tokenizer.enable_padding(pad_id=0, pad_token="[PAD]", length=256)
         return tokenizer  # type: ignore
 
-    @cached_property
+    @property
     def model(self) -> "InferenceSession":  # type: ignore[name-defined] # noqa: F821
+        return self._get_sessions(self._state)[0]
+
+    def _get_sessions(
+        self, state: Optional[_ModelState] = None
+    ) -> List["InferenceSession"]:  # type: ignore # noqa: F821
+        state = state or self._state
+        if state.sessions and state.pid != os.getpid():
+            raise RuntimeError(
+                f"The inference sessions were created in process {state.pid} and cannot be used in the forked "
+                f"process {os.getpid()}. ONNX Runtime sessions are not fork-safe, call preload() instead of "
+                "warmup() or embedding documents in the parent process."
+            )
+        if not state.sessions:
+            with self._lock:
+                if not state.sessions:
+                    sessions = [
+                        self._create_session(state) for _ in range(self._num_sessions)
+                    ]
+                    for sess in sessions:
+                        state.idle_sessions.put(sess)
+                    # inputs and outputs are the same for all sessions, read them once instead of on every batch
+                    state.input_names = [i.name for i in sessions[0].get_inputs()]
+                    output = sessions[0].get_outputs()[0]
+                    state.output_name = output.name
+                    if isinstance(output.shape[-1], int):
+                        state.hidden_size = output.shape[-1]
+                    state.pid = os.getpid()
+                    state.sessions = sessions
+        return state.sessions
+
+    def _create_session(self, state: _ModelState) -> "InferenceSession":  # type: ignore # noqa: F821
         if self._preferred_providers is None or len(self._preferred_providers) == 0:
             if len(self.ort.get_available_providers()) > 0:
                 logger.debug(
@@ -163,15 +1288,222 @@ class OnnxRuntimeEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
             )
 
         so = self.ort.SessionOptions()
+        if self._intra_op_num_threads is not None:
+            so.intra_op_num_threads = self._intra_op_num_threads
+        if self._inter_op_num_threads is not None:
+            so.inter_op_num_threads = self._inter_op_num_threads
+        if self._parallel_execution:
+            so.execution_mode = self.ort.ExecutionMode.ORT_PARALLEL
+        if self._ort_profiling_dir:
+            os.makedirs(self._ort_profiling_dir, exist_ok=True)
+            so.enable_profiling = True
+            so.profile_file_prefix = os.path.join(
+                self._ort_profiling_dir, "onnxruntime_profile"
+            )
+        model_path = state.model_path
+        if self._shared_weights:
+            weights = self._get_weights(state)
+            model_path = self._find_external_data_model(
+                state.model_path, self._model_cache_dir
+            )
+            # the session reads the weights from the mapped file instead of loading its own copy
+            so.add_external_initializers(list(weights.keys()), list(weights.values()))
+            # prepacking would copy the weights into private buffers of every process
+            so.add_session_config_entry("session.disable_prepacking", "1")
+        optimized_model_path = None
+        if self._cache_optimized_model:
+            optimized_model_path = self._optimized_model_path(state)
+            if os.path.exists(optimized_model_path):
+                model_path = optimized_model_path
+                # the cached graph is already optimized
+                so.graph_optimization_level = (
+                    self.ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+                )
+            else:
+                os.makedirs(self._model_cache_dir, exist_ok=True)
+                so.optimized_model_filepath = (
+                    f"{optimized_model_path}.{os.getpid()}.tmp"
+                )
         sess = self.ort.InferenceSession(
-            self._actual_model_path,
+            model_path,
             # Since 1.9 onnyx runtime requires providers to be specified when there are multiple available - https://onnxruntime.ai/docs/api/python/api_summary.html
             # This is probably not ideal but will improve DX as no exceptions will be raised in multi-provider envs
             providers=self._preferred_providers,
             sess_options=so,
         )
+        if optimized_model_path and so.optimized_model_filepath:
+            os.replace(so.optimized_model_filepath, optimized_model_path)
 
         return sess
 
+    def _get_weights(self, state: _ModelState) -> Dict[str, "OrtValue"]:  # type: ignore # noqa: F821
+        if state.weights is None:
+            export_path = self._find_external_data_model(
+                state.model_path, self._model_cache_dir
+            )
+            state.weights = {
+                name: self.ort.OrtValue.ortvalue_from_numpy(array)
+                for name, array in _map_weights(export_path).items()
+            }
+        return state.weights
+
+    def preload(self) -> None:
+        """
+        Load everything that can be shared with forked worker processes without creating an inference session:
+        the tokenizer and, with `shared_weights`, the memory-mapped model weights. Call it in the parent process
+        of a pre-forking server, every worker then only creates its own sessions on first use.
+        """
+        state = self._state
+        self._get_tokenizer(state)
+        if self._shared_weights:
+            with self._lock:
+                self._get_weights(state)
+
+    def _optimized_model_path(self, state: Optional[_ModelState] = None) -> str:
+        """
+        The path of the cached optimized graph. Optimizations depend on the model, the ONNX Runtime version
+        and the execution providers (and hardware) they were made for, so all of them are part of the key.
+        """
+        state = state or self._state
+        key = "_".join(
+            [
+                state.model_sha256()[:16],
+                f"ort{self.ort.__version__}",
+                platform.machine(),
+                "-".join(self._preferred_providers or []),
+            ]
+        )
+        return os.path.join(self._model_cache_dir, f"{key}_optimized.onnx")
+
+    def end_ort_profiling(self) -> List[str]:
+        """
+        Stop the ONNX Runtime profiler of every session and write the trace files.
+
+        :return: The paths of the trace files (one per session). They can be opened in chrome://tracing or Perfetto.
+        """
+        if not self._ort_profiling_dir:
+            raise ValueError(
+                "ONNX Runtime profiling is not enabled, set ort_profiling_dir"
+            )
+        return [session.end_profiling() for session in self._get_sessions()]
+
+    def warmup(self) -> None:
+        """
+        Eagerly load the tokenizer and the inference sessions and run a dummy batch on each session
+        so that the first real call is not a latency outlier.
+        """
+        self._warmup(self._state)
+
+    def _warmup(self, state: _ModelState) -> None:
+        batch = self._encode(["warmup"], state)
+        for session in self._get_sessions(state):
+            self._run(*batch, session=session, state=state)
+
+    @property
+    def model_version(self) -> str:
+        """
+        The version tag of the current model. Unless a version was given to reload(), it is derived from the model file hash.
+        """
+        return self._state.model_version()
+
+    def reload(
+        self,
+        model_path: str,
+        *,
+        hf_download: Optional[bool] = False,
+        version: Optional[str] = None,
+    ) -> "Future[str]":
+        """
+        Load a new model in the background and swap it in once it is warmed up. Calls that are in flight
+        when the swap happens finish on the previous model, later calls use the new one.
+
+        :param model_path: The local path or the HuggingFace repository of the new model.
+        :param hf_download: Whether to download the model from HuggingFace repository. Default is False.
+        :param version: The version tag of the new model. Default is derived from the model file hash.
+        :return: A future that resolves to the version tag of the new model once it has been swapped in.
+
+        Example:
+            >>> ef = OnnxRuntimeEmbeddings(model_path="model-v1")
+            >>> ef.reload("model-v2", version="v2").result()
+            'v2'
+        """
+        future: "Future[str]" = Future()
+
+        def _reload() -> None:
+            try:
+                state = self._resolve_model(model_path, hf_download, version)
+                self._warmup(state)
+                model_version = state.model_version()
+                with self._lock:
+                    self._state = state
+                logger.info(f"Reloaded model {state.model_path} ({model_version})")
+                future.set_result(model_version)
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=_reload, name="onnx-reload", daemon=True).start()
+        return future
+
+    def embed_with_version(self, input: Documents) -> Tuple[str, Embeddings]:
+        """
+        Get the embeddings together with the version tag of the model that produced them.
+
+        :param input: A list of texts to get embeddings for.
+        :return: A tuple of the model version tag and the embeddings.
+        """
+        state = self._state
+        return state.model_version(), self._convert(self._forward(input, state=state))
+
+    def quantization_drift(self, sample: Documents) -> Dict[str, float]:
+        """
+        Compare the embeddings of the quantized model against the fp32 model on a sample set.
+
+        :param sample: The documents to embed with both models.
+        :return: The mean and minimum cosine similarity between the fp32 and the int8 embeddings.
+        """
+        if not self._quantized:
+            raise ValueError(
+                "Quantization drift can only be measured for quantized models"
+            )
+        fp32_ef = OnnxRuntimeEmbeddings(
+            self._local_model_path,
+            preferred_providers=self._preferred_providers,
+            max_length=self._max_length,
+            enabled_padding=self._enabled_padding,
+            dynamic_padding=self._dynamic_padding,
+            output_dimensions=self._output_dimensions,
+            batch_size=self._batch_size,
+            model_cache_dir=self._model_cache_dir,
+        )
+        # both outputs are normalized so the dot product is the cosine similarity
+        similarities = np.sum(fp32_ef._forward(sample) * self._forward(sample), axis=1)
+        drift = {
+            "mean_similarity": float(np.mean(similarities)),
+            "min_similarity": float(np.min(similarities)),
+        }
+        logger.info(f"Quantization drift for {self._actual_model_path}: {drift}")
+        return drift
+
+    def model_identity(self) -> Dict[str, Any]:
+        """
+        The configuration that changes the embeddings, used as the model identity of the embedding cache.
+        """
+        return {
+            "model_version": self.model_version,
+            "max_length": self._max_length,
+            "output_dimensions": self._output_dimensions,
+        }
+
+    @instrumented("embed")
     def __call__(self, input: Documents) -> Embeddings:
-        return cast(Embeddings, self._forward(input).tolist())
+        return self._convert(self._forward(input))
+
+    def _convert(self, embeddings: npt.NDArray[np.float32]) -> Embeddings:
+        if self._return_numpy:
+            return cast(Embeddings, embeddings)
+        if self.stats is None:
+            return cast(Embeddings, embeddings.tolist())
+        start = time.perf_counter()
+        embeddings_list = embeddings.tolist()
+        self.stats.record("convert", time.perf_counter() - start)
+        return cast(Embeddings, embeddings_list)
@@ -0,0 +1,326 @@
+"""
+A local embedding server that hosts one embedding function for all processes on the host.
+
+Requests from all clients are coalesced into large batches and the embeddings are returned through shared memory.
+
+Usage:
+    python -m chromadbx.embeddings.serve \\
+        --embedding-function chromadbx.embeddings.onnx:OnnxRuntimeEmbeddings \\
+        --kwargs '{"model_path": "snowflake/arctic-embed-s", "hf_download": true}'
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Optional, Sequence, cast
+
+import numpy as np
+import numpy.typing as npt
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from chromadbx.core.instrumentation import instrumented
+from chromadbx.embeddings.utils import Coalescer, check_numpy_embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = os.path.join(tempfile.gettempdir(), "chromadbx-embeddings.sock")
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_MAX_WAIT = 0.005
+
+# every message is a JSON object prefixed with its length
+_HEADER = struct.Struct("!I")
+
+
+def _send(sock: socket.socket, message: Dict[str, Any]) -> None:
+    payload = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("The connection to the embedding server was closed")
+        received += n
+    return bytes(buffer)
+
+
+def _recv(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    header = sock.recv(_HEADER.size, socket.MSG_WAITALL)
+    if not header:
+        return None
+    if len(header) < _HEADER.size:
+        header += _recv_exact(sock, _HEADER.size - len(header))
+    (size,) = _HEADER.unpack(header)
+    return cast(Dict[str, Any], json.loads(_recv_exact(sock, size)))
+
+
+def _attach(name: str) -> SharedMemory:
+    shm = SharedMemory(name=name)
+    # the server owns the memory, the resource tracker of the client must not unlink it when the client exits
+    resource_tracker.unregister(getattr(shm, "_name", name), "shared_memory")
+    return shm
+
+
+class EmbeddingServer:
+    """
+    Serves an embedding function over a Unix socket. Use EmbeddingServerClient to connect to it.
+    """
+
+    def __init__(
+        self,
+        embedding_function: EmbeddingFunction[Documents],
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        *,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait: float = DEFAULT_MAX_WAIT,
+    ):
+        """
+        Initialize the EmbeddingServer.
+
+        :param embedding_function: The embedding function to serve.
+        :param socket_path: The path of the Unix socket to listen on. Default is `chromadbx-embeddings.sock` in the temp directory.
+        :param max_batch_size: The maximum number of documents coalesced into one call of the embedding function. Default is 256.
+        :param max_wait: The maximum number of seconds a request waits for other requests to fill up a batch. Default is 0.005.
+        """
+        if max_batch_size < 1:
+            raise ValueError("Max batch size must be at least 1")
+        if max_wait < 0:
+            raise ValueError("Max wait must not be negative")
+        self.socket_path = socket_path
+        self._remove_stale_socket()
+        self._coalescer = Coalescer(embedding_function, max_batch_size, max_wait)
+        coalescer = self._coalescer
+
+        class _Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                shm: Optional[SharedMemory] = None
+                try:
+                    while (request := _recv(self.request)) is not None:
+                        try:
+                            embeddings = coalescer.submit(request["input"]).result()
+                        except Exception as e:
+                            _send(self.request, {"error": f"{type(e).__name__}: {e}"})
+                            continue
+                        if shm is None or shm.size < embeddings.nbytes:
+                            if shm is not None:
+                                shm.close()
+                                shm.unlink()
+                            # the buffer is reused for all responses on the connection and only grows
+                            shm = SharedMemory(
+                                create=True, size=max(embeddings.nbytes, 1)
+                            )
+                        view = np.ndarray(
+                            embeddings.shape, dtype=np.float32, buffer=shm.buf
+                        )
+                        view[:] = embeddings
+                        del view
+                        _send(
+                            self.request,
+                            {"shm": shm.name, "shape": list(embeddings.shape)},
+                        )
+                except ConnectionError:
+                    pass
+                finally:
+                    if shm is not None:
+                        shm.close()
+                        shm.unlink()
+
+        self._server = socketserver.ThreadingUnixStreamServer(socket_path, _Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    def _remove_stale_socket(self) -> None:
+        if not os.path.exists(self.socket_path):
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(self.socket_path)
+            except ConnectionRefusedError:
+                # left behind by a server that did not shut down cleanly
+                os.unlink(self.socket_path)
+                return
+        raise ValueError(
+            f"An embedding server is already listening on {self.socket_path}"
+        )
+
+    def serve_forever(self) -> None:
+        logger.info(f"Serving embeddings on {self.socket_path}")
+        self._server.serve_forever()
+
+    def start(self) -> "EmbeddingServer":
+        """
+        Serve in a background thread.
+        """
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="embedding-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+        self._server.server_close()
+        self._coalescer.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def __enter__(self) -> "EmbeddingServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class _Connection:
+    def __init__(self, socket_path: str, timeout: Optional[float]):
+        self.pid = os.getpid()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(socket_path)
+        self.shm: Optional[SharedMemory] = None
+
+    def embed(self, documents: Documents) -> npt.NDArray[np.float32]:
+        _send(self.sock, {"input": list(documents)})
+        response = _recv(self.sock)
+        if response is None:
+            raise ConnectionError("The connection to the embedding server was closed")
+        if "error" in response:
+            raise ValueError(f"The embedding server failed: {response['error']}")
+        if self.shm is None or self.shm.name != response["shm"]:
+            if self.shm is not None:
+                self.shm.close()
+            self.shm = _attach(response["shm"])
+        # the server reuses the buffer for the next response on this connection
+        embeddings = np.ndarray(
+            tuple(response["shape"]), dtype=np.float32, buffer=self.shm.buf
+        )
+        return cast(npt.NDArray[np.float32], embeddings.copy())
+
+    def close(self) -> None:
+        self.sock.close()
+        if self.shm is not None:
+            self.shm.close()
+
+
+class EmbeddingServerClient(EmbeddingFunction[Documents]):  # type: ignore[misc]
+    """
+    This class is used to get embeddings from an EmbeddingServer running on the same host.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        *,
+        timeout: Optional[float] = None,
+        return_numpy: Optional[bool] = False,
+    ):
+        """
+        Initialize the EmbeddingServerClient.
+
+        :param socket_path: The path of the Unix socket the server listens on. Default is `chromadbx-embeddings.sock` in the temp directory.
+        :param timeout: The socket timeout in seconds. Default is None (no timeout).
+        :param return_numpy: Whether to return the embeddings as float32 numpy rows of one matrix instead of lists. Default is False.
+        """
+        self._socket_path = socket_path
+        self._timeout = timeout
+        check_numpy_embeddings(return_numpy)
+        self._return_numpy = return_numpy
+        # every thread has its own connection so that requests from many threads are coalesced by the server
+        self._local = threading.local()
+
+    def _connection(self) -> _Connection:
+        connection: Optional[_Connection] = getattr(self._local, "connection", None)
+        if connection is None or connection.pid != os.getpid():
+            # connections are not shared with forked processes
+            connection = _Connection(self._socket_path, self._timeout)
+            self._local.connection = connection
+        return connection
+
+    @instrumented("embed")
+    def __call__(self, input: Documents) -> Embeddings:
+        if not input:
+            return []
+        connection = self._connection()
+        try:
+            embeddings = connection.embed(input)
+        except (ConnectionError, OSError):
+            # the connection is unusable after a failed or partial exchange
+            self._local.connection = None
+            connection.close()
+            raise
+        if self._return_numpy:
+            return cast(Embeddings, embeddings)
+        return cast(Embeddings, embeddings.tolist())
+
+
+def _load_embedding_function(
+    name: str, kwargs: Dict[str, Any]
+) -> EmbeddingFunction[Documents]:
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(
+            f"Invalid embedding function {name}, expected `<module>:<class>`"
+        )
+    module = importlib.import_module(module_name)
+    return cast(EmbeddingFunction[Documents], getattr(module, class_name)(**kwargs))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m chromadbx.embeddings.serve",
+        description="Serve an embedding function to the processes on this host over a Unix socket.",
+    )
+    parser.add_argument("--socket-path", default=DEFAULT_SOCKET_PATH)
+    parser.add_argument(
+        "--embedding-function",
+        default="chromadbx.embeddings.onnx:OnnxRuntimeEmbeddings",
+        help="The embedding function class as `<module>:<class>`.",
+    )
+    parser.add_argument(
+        "--kwargs",
+        default="{}",
+        help="The keyword arguments of the embedding function as a JSON object.",
+    )
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument(
+        "--max-wait",
+        type=float,
+        default=DEFAULT_MAX_WAIT,
+        help="The maximum number of seconds a request waits for a batch to fill up.",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    embedding_function = _load_embedding_function(
+        args.embedding_function, json.loads(args.kwargs)
+    )
+    server = EmbeddingServer(
+        embedding_function,
+        args.socket_path,
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,28 @@
-from typing import Optional, cast
+from itertools import islice
+from typing import Any, Dict, Optional, cast
 
+import numpy as np
+import numpy.typing as npt
 from chromadb.api.types import Documents, Embeddings, EmbeddingFunction
 
+from chromadbx.core.instrumentation import instrumented
+from chromadbx.embeddings.utils import check_numpy_embeddings
+
 
 class SpacyEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[misc]
     """
     SpacyEmbeddingFunction is an embedding function that uses the spacy library to get embeddings for a list of texts. See https://spacy.io/usage/models for more information.
     """
 
-    def __init__(self, model_name: Optional[str] = "en_core_web_lg"):
+    def __init__(
+        self,
+        model_name: Optional[str] = "en_core_web_lg",
+        *,
+        return_numpy: Optional[bool] = False,
+        batch_size: Optional[int] = None,
+        n_process: Optional[int] = 1,
+        vectors_only: Optional[bool] = False,
+    ):
         """
         Initialize the SpacyEmbeddingFunction.
         The default model is "en_core_web_lg" which is a large model that optimizes accuracy and has embeddings in-built.
@@ -16,6 +30,15 @@ class SpacyEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[misc
         Args:
             model_name (str): The name of the spacy model to use.
             default: "en_core_web_lg"
+            return_numpy (bool): Whether to return the embeddings as float32 numpy rows of one matrix instead of lists.
+            default: False
+            batch_size (int): The number of texts processed together by the spacy pipeline.
+            default: None (the batch size of the model)
+            n_process (int): The number of processes running the spacy pipeline, -1 for one per CPU. Ignored with `vectors_only`.
+            default: 1
+            vectors_only (bool): Whether to only tokenize the texts and average the token vectors of the model's vectors table,
+                skipping the rest of the pipeline. Requires a model with static vectors (e.g. "en_core_web_md" or "en_core_web_lg").
+            default: False
 
         """
         try:
@@ -25,6 +48,11 @@ class SpacyEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[misc
                 "The spacy python package is not installed. Please install it with `pip install spacy`"
             )
         self._model_name = model_name
+        check_numpy_embeddings(return_numpy)
+        self._return_numpy = return_numpy
+        self._batch_size = batch_size
+        self._n_process = n_process
+        self._vectors_only = vectors_only
 
         try:
             # disable ner, tagger, parser, attribute_ruler, lemmatizer to speed up the model
@@ -37,7 +65,21 @@ class SpacyEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[misc
                 f"""spacy model '{self._model_name}' are not downloaded yet, please download them using `python -m spacy download {self._model_name}`, Please checkout
                 for the list of models from: https://spacy.io/usage/models."""
             )
+        if vectors_only:
+            vectors = self._nlp.vocab.vectors
+            if vectors.shape[0] == 0 or vectors.mode != "default":
+                raise ValueError(
+                    f"spacy model '{self._model_name}' has no static vectors table, vectors only mode requires e.g. en_core_web_md or en_core_web_lg"
+                )
+
+    def model_identity(self) -> Dict[str, Any]:
+        # vectors only mode produces the same embeddings as the full pipeline
+        return {
+            "model_name": self._model_name,
+            "model_version": self._nlp.meta.get("version"),
+        }
 
+    @instrumented("embed")
     def __call__(self, input: Documents) -> Embeddings:
         """
         Get the embeddings for a list of texts.
@@ -52,8 +94,51 @@ class SpacyEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[misc
             >>> input = ["Hello, world!", "How are you?"]
             >>> embeddings = spacy_fn(input)
         """
-        embeddings = []
-        for em in self._nlp.pipe(input):
-            embeddings.append(em.vector.astype("float"))
+        if self._vectors_only:
+            embeddings = self._embed_vectors(input)
+        else:
+            embeddings = self._embed_pipeline(input)
+        if self._return_numpy:
+            return cast(Embeddings, embeddings)
+        # the rows are float32 views of a single matrix
+        return cast(Embeddings, list(embeddings))
+
+    def _embed_pipeline(self, input: Documents) -> npt.NDArray[np.float32]:
+        embeddings: Optional[npt.NDArray[np.float32]] = None
+        for i, doc in enumerate(
+            self._nlp.pipe(
+                input, batch_size=self._batch_size, n_process=self._n_process or 1
+            )
+        ):
+            vector = doc.vector
+            if embeddings is None:
+                embeddings = np.empty((len(input), len(vector)), dtype=np.float32)
+            embeddings[i] = vector
+        if embeddings is None:
+            # no documents, chromadb rejects the empty result
+            return np.empty((0, 0), dtype=np.float32)
+        return embeddings
+
+    def _embed_vectors(self, input: Documents) -> npt.NDArray[np.float32]:
+        from spacy.attrs import ORTH
 
-        return cast(Embeddings, embeddings)
+        vectors = self._nlp.vocab.vectors
+        table = np.asarray(vectors.data)
+        embeddings = np.zeros((len(input), np.shape(table)[1]), dtype=np.float32)
+        batch_size = self._batch_size or self._nlp.batch_size
+        docs = self._nlp.tokenizer.pipe(input, batch_size=batch_size)
+        for start in range(0, len(input), batch_size):
+            orths = [doc.to_array(ORTH) for doc in islice(docs, batch_size)]
+            lengths = np.array([len(orth) for orth in orths])
+            if lengths.sum() == 0:
+                continue
+            rows = vectors.find(keys=np.concatenate(orths).tolist())
+            token_vectors = table[np.maximum(rows, 0)]
+            # out-of-vocabulary tokens count as zero vectors in the mean, like Doc.vector
+            token_vectors[rows < 0] = 0
+            non_empty = np.flatnonzero(lengths)
+            offsets = (np.cumsum(lengths) - lengths)[non_empty]
+            sums = np.add.reduceat(token_vectors, offsets)
+            sums /= lengths[non_empty, None]
+            embeddings[start + non_empty] = sums
+        return embeddings
@@ -1,7 +1,16 @@
-from typing import Optional, cast
+from typing import Any, Dict, Optional, cast
 
 from chromadb.api.types import Documents, Embeddings, EmbeddingFunction
 
+from chromadbx.core.instrumentation import instrumented
+from chromadbx.core.ratelimit import (
+    RateLimiter,
+    RetryPolicy,
+    acall_with_retry,
+    call_with_retry,
+)
+from chromadbx.embeddings.utils import Batcher, ConcurrencyLimit
+
 
 class TogetherEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[misc]
     """
@@ -14,6 +23,13 @@ class TogetherEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[m
         self,
         api_key: str,
         model_name: Optional[str] = "togethercomputer/m2-bert-80M-8k-retrieval",
+        max_concurrency: Optional[int] = 16,
+        max_batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        parallelism: Optional[int] = 4,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        base_url: Optional[str] = None,
     ):
         """
         Initialize the TogetherEmbeddingFunction.
@@ -21,6 +37,13 @@ class TogetherEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[m
         Args:
             api_key (str): The API key for the Together API.
             model_name (Optional[str]): The name of the model to use for embedding. Defaults to "togethercomputer/m2-bert-80M-8k-retrieval".
+            max_concurrency (Optional[int]): The maximum number of concurrent requests made by `aembed`. Defaults to 16, None for no limit.
+            max_batch_size (Optional[int]): The maximum number of texts per request, larger inputs are split into several requests. Defaults to None (no limit).
+            max_batch_tokens (Optional[int]): The maximum number of estimated tokens per request. Defaults to None (no limit).
+            parallelism (Optional[int]): The number of requests of a split input that are sent at the same time. Defaults to 4.
+            rate_limiter (Optional[RateLimiter]): The rate limiter to wait for before every request, can be shared between instances. Defaults to None (no limit).
+            retry_policy (Optional[RetryPolicy]): How to retry requests that failed with a retryable error (e.g. 429). Replaces the retries of the Together client. Defaults to 3 retries with jittered exponential backoff.
+            base_url (Optional[str]): The base URL of the Together API, e.g. of a proxy. Defaults to None (the public API).
         """
 
         try:
@@ -31,8 +54,18 @@ class TogetherEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[m
             )
         together.api_key = api_key
         self.model_name = model_name
-        self.client = together.Together()
+        # the retry policy replaces the client's own retries instead of compounding them
+        self.client = together.Together(base_url=base_url, max_retries=0)
+        self.async_client = together.AsyncTogether(base_url=base_url, max_retries=0)
+        self._concurrency_limit = ConcurrencyLimit(max_concurrency)
+        self._rate_limiter = rate_limiter
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._batcher = Batcher(max_batch_size, max_batch_tokens, parallelism)
+
+    def model_identity(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name}
 
+    @instrumented("embed")
     def __call__(self, input: Documents) -> Embeddings:
         """
         Get the embeddings for a list of texts.
@@ -49,5 +82,50 @@ class TogetherEmbeddingFunction(EmbeddingFunction[Documents]):  # type: ignore[m
             >>> ef = TogetherEmbeddingFunction(api_key=os.getenv("TOGETHER_API_KEY"))
             >>> embeddings = ef(["hello world", "goodbye world"])
         """
-        outputs = self.client.embeddings.create(input=input, model=self.model_name)
+        return self._batcher(self._embed_batch, input)
+
+    def _embed_batch(self, input: Documents) -> Embeddings:
+        def request() -> Any:
+            return self.client.embeddings.create(input=input, model=self.model_name)
+
+        outputs = call_with_retry(
+            request,
+            retry_policy=self._retry_policy,
+            rate_limiter=self._rate_limiter,
+            input=input,
+        )
+        return cast(Embeddings, [outputs.data[i].embedding for i in range(len(input))])
+
+    @instrumented("aembed")
+    async def aembed(self, input: Documents) -> Embeddings:
+        """
+        Get the embeddings for a list of texts without blocking the event loop.
+
+        Args:
+            input (Documents): A list of texts to get embeddings for.
+
+        Returns:
+            Embeddings: The embeddings for the texts.
+
+        Example:
+            >>> import os
+            >>> from chromadbx.embeddings.together import TogetherEmbeddingFunction
+            >>> ef = TogetherEmbeddingFunction(api_key=os.getenv("TOGETHER_API_KEY"))
+            >>> embeddings = await ef.aembed(["hello world", "goodbye world"])
+        """
+        return await self._batcher.acall(self._aembed_batch, input)
+
+    async def _aembed_batch(self, input: Documents) -> Embeddings:
+        async def request() -> Any:
+            async with self._concurrency_limit:
+                return await self.async_client.embeddings.create(
+                    input=input, model=self.model_name
+                )
+
+        outputs = await acall_with_retry(
+            request,
+            retry_policy=self._retry_policy,
+            rate_limiter=self._rate_limiter,
+            input=input,
+        )
         return cast(Embeddings, [outputs.data[i].embedding for i in range(len(input))])
@@ -0,0 +1,424 @@
+import asyncio
+import contextvars
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import httpx
+import numpy as np
+import numpy.typing as npt
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from chromadbx.core.ratelimit import estimate_tokens
+
+T = TypeVar("T")
+
+_Request = Tuple[Documents, "Future[npt.NDArray[np.float32]]"]
+
+
+class LoopLocal(Generic[T]):
+    """
+    A value created on first use in every event loop, for objects that must not be used from another event loop
+    than the one they were first used in, e.g. async clients and semaphores. The values of closed loops are dropped.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        """
+        :param factory: Creates the value of a loop.
+        """
+        self._factory = factory
+        self._values: Dict[asyncio.AbstractEventLoop, T] = {}
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            value = self._values.get(loop)
+            if value is None:
+                for closed in [other for other in self._values if other.is_closed()]:
+                    del self._values[closed]
+                value = self._values[loop] = self._factory()
+            return value
+
+
+class ConcurrencyLimit:
+    """
+    An async context manager that limits the number of concurrent requests of an embedding function.
+    Every event loop gets its own semaphore.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None):
+        """
+        :param max_concurrency: The maximum number of concurrent requests. Default is None (unlimited).
+        """
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("Max concurrency must be at least 1")
+        self._semaphores: Optional[LoopLocal[asyncio.Semaphore]] = None
+        if max_concurrency is not None:
+            limit = max_concurrency
+            self._semaphores = LoopLocal(lambda: asyncio.Semaphore(limit))
+
+    async def __aenter__(self) -> None:
+        if self._semaphores is not None:
+            await self._semaphores.get().acquire()
+
+    async def __aexit__(self, *args: Any) -> None:
+        if self._semaphores is not None:
+            self._semaphores.get().release()
+
+
+def _check_http2(http2: bool) -> None:
+    if not http2:
+        return
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        raise ValueError(
+            "The h2 python package is not installed. Please install it with `pip install httpx[http2]`"
+        )
+
+
+def check_numpy_embeddings(return_numpy: Optional[bool]) -> None:
+    """
+    Raise if numpy embeddings are requested but the installed chromadb only accepts lists of floats.
+    """
+    if not return_numpy:
+        return
+    from chromadb.api import types
+
+    # chromadb normalizes numpy embeddings since 0.5.11, older versions reject anything but lists in EmbeddingFunction.__call__
+    if not hasattr(types, "normalize_embeddings"):
+        raise ValueError(
+            "return_numpy requires chromadb 0.5.11 or later. Please upgrade it with `pip install -U 'chromadb>=0.5.11'`"
+        )
+
+
+def model_identity(embedding_function: EmbeddingFunction[Documents]) -> str:
+    """
+    Identify the model of an embedding function by its class and the configuration returned by its `model_identity()`
+    method, i.e. everything that changes the embeddings (e.g. model name, dimensions, task type).
+    """
+    cls = type(embedding_function)
+    identity = getattr(embedding_function, "model_identity", None)
+    if not callable(identity):
+        raise ValueError(
+            f"{cls.__qualname__} does not define model_identity(), pass model_id to identify its model"
+        )
+    return f"{cls.__module__}.{cls.__qualname__}:{json.dumps(identity(), sort_keys=True, default=str)}"
+
+
+def create_transport(
+    *,
+    http2: bool = False,
+    max_connections: Optional[int] = 100,
+    max_keepalive_connections: Optional[int] = 20,
+    keepalive_expiry: Optional[float] = 5.0,
+) -> httpx.HTTPTransport:
+    """
+    Create a connection pool that can be shared by the httpx clients of several embedding functions.
+
+    :param http2: Whether to negotiate HTTP/2, which multiplexes concurrent requests over one connection. Default is False.
+    :param max_connections: The maximum number of open connections. Default is 100, None for no limit.
+    :param max_keepalive_connections: The maximum number of idle connections kept open. Default is 20, None for no limit.
+    :param keepalive_expiry: The number of seconds after which idle connections are closed. Default is 5, None to keep them open.
+    """
+    _check_http2(http2)
+    return httpx.HTTPTransport(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+    )
+
+
+def create_async_transport(
+    *,
+    http2: bool = False,
+    max_connections: Optional[int] = 100,
+    max_keepalive_connections: Optional[int] = 20,
+    keepalive_expiry: Optional[float] = 5.0,
+) -> httpx.AsyncHTTPTransport:
+    """
+    Create a connection pool that can be shared by the async httpx clients of several embedding functions.
+    The transport must only be used from a single event loop. See `create_transport` for the parameters.
+    """
+    _check_http2(http2)
+    return httpx.AsyncHTTPTransport(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+    )
+
+
+class HTTPClientOptions:
+    """
+    The connection settings of the sync and async httpx clients of an embedding function.
+    """
+
+    def __init__(
+        self,
+        *,
+        headers: Dict[str, str],
+        timeout: Union[float, httpx.Timeout, None] = httpx.Timeout(5.0),
+        http2: bool = False,
+        max_connections: Optional[int] = 100,
+        max_keepalive_connections: Optional[int] = 20,
+        keepalive_expiry: Optional[float] = 5.0,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        :param headers: The headers sent with every request.
+        :param timeout: The timeout of a request. Default is 5 seconds, None for no timeout.
+        :param http2: Whether to negotiate HTTP/2. Default is False.
+        :param max_connections: The maximum number of open connections. Default is 100, None for no limit.
+        :param max_keepalive_connections: The maximum number of idle connections kept open. Default is 20, None for no limit.
+        :param keepalive_expiry: The number of seconds after which idle connections are closed. Default is 5, None to keep them open.
+        :param transport: A shared transport for the sync client, its own pool settings replace the ones above.
+        :param async_transport: A shared transport for the async client, its own pool settings replace the ones above.
+        """
+        _check_http2(http2)
+        self._headers = headers
+        self._timeout = timeout
+        self._http2 = http2
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._transport = transport
+        self._async_transport = async_transport
+
+    def client(self) -> httpx.Client:
+        return httpx.Client(
+            headers=self._headers,
+            timeout=self._timeout,
+            http2=self._http2,
+            limits=self._limits,
+            transport=self._transport,
+        )
+
+    def async_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            headers=self._headers,
+            timeout=self._timeout,
+            http2=self._http2,
+            limits=self._limits,
+            transport=self._async_transport,
+        )
+
+
+def split_batches(
+    input: Documents,
+    max_batch_size: Optional[int] = None,
+    max_batch_tokens: Optional[int] = None,
+) -> List[Documents]:
+    """
+    Split the input into consecutive batches of at most `max_batch_size` texts and `max_batch_tokens` estimated tokens.
+    A text that alone exceeds the token limit is sent in a batch of its own.
+    """
+    batches: List[Documents] = []
+    batch: Documents = []
+    batch_tokens = 0
+    for text in input:
+        tokens = estimate_tokens(text) if max_batch_tokens else 0
+        if batch and (
+            (max_batch_size and len(batch) >= max_batch_size)
+            or (max_batch_tokens and batch_tokens + tokens > max_batch_tokens)
+        ):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class Batcher:
+    """
+    Splits requests that exceed the limits of a provider into sub-requests, sends them concurrently
+    and reassembles the embeddings in input order. Synchronous calls share one thread pool, created
+    on first use and kept for the lifetime of the instance.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        parallelism: Optional[int] = 4,
+    ):
+        """
+        :param max_batch_size: The maximum number of texts per request. Default is None (no limit).
+        :param max_batch_tokens: The maximum number of estimated tokens per request. Default is None (no limit).
+        :param parallelism: The maximum number of sub-requests in flight at the same time. For synchronous
+            calls the limit is shared by all calls on the instance, for async calls it applies per call. Default is 4.
+        """
+        if max_batch_size is not None and max_batch_size < 1:
+            raise ValueError("Max batch size must be at least 1")
+        if max_batch_tokens is not None and max_batch_tokens < 1:
+            raise ValueError("Max batch tokens must be at least 1")
+        if parallelism is not None and parallelism < 1:
+            raise ValueError("Parallelism must be at least 1")
+        self._max_batch_size = max_batch_size
+        self._max_batch_tokens = max_batch_tokens
+        self._parallelism = parallelism or 1
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _split(self, input: Documents) -> List[Documents]:
+        return split_batches(input, self._max_batch_size, self._max_batch_tokens)
+
+    def __call__(
+        self, fn: Callable[[Documents], Embeddings], input: Documents
+    ) -> Embeddings:
+        batches = self._split(input)
+        if len(batches) <= 1 or self._parallelism == 1:
+            return [embedding for batch in batches for embedding in fn(batch)]
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self._parallelism,
+                        thread_name_prefix="embedding-batcher",
+                    )
+        # sub-requests run in copies of the caller's context, e.g. to keep its instrumentation span
+        contexts = [contextvars.copy_context() for _ in batches]
+
+        def send(context: contextvars.Context, batch: Documents) -> Embeddings:
+            return context.run(fn, batch)
+
+        # map() yields the results in the order of the batches
+        return [
+            embedding
+            for embeddings in self._executor.map(send, contexts, batches)
+            for embedding in embeddings
+        ]
+
+    async def acall(
+        self, fn: Callable[[Documents], Awaitable[Embeddings]], input: Documents
+    ) -> Embeddings:
+        batches = self._split(input)
+        semaphore = asyncio.Semaphore(self._parallelism)
+
+        async def send(batch: Documents) -> Embeddings:
+            async with semaphore:
+                return await fn(batch)
+
+        results = await asyncio.gather(*[send(batch) for batch in batches])
+        return [embedding for embeddings in results for embedding in embeddings]
+
+
+class Coalescer:
+    """
+    Collects documents submitted from many threads and embeds them together in batches of up to `max_batch_size`
+    documents, waiting at most `max_wait` seconds for a batch to fill up.
+    """
+
+    def __init__(
+        self,
+        embedding_function: EmbeddingFunction[Documents],
+        max_batch_size: int,
+        max_wait: float,
+    ):
+        """
+        :param embedding_function: The embedding function to send the batched documents to.
+        :param max_batch_size: The number of documents after which a batch is sent without waiting.
+        :param max_wait: The maximum time in seconds a document waits for others to join its batch.
+        """
+        self._embedding_function = embedding_function
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        # set when the batching thread died, guards submissions that would otherwise never be embedded
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name="embedding-coalescer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, documents: Documents) -> "Future[npt.NDArray[np.float32]]":
+        future: "Future[npt.NDArray[np.float32]]" = Future()
+        with self._lock:
+            if self._error is not None:
+                raise RuntimeError("The embedding coalescer stopped") from self._error
+            self._queue.put((documents, future))
+        return future
+
+    def _run(self) -> None:
+        try:
+            self._batch()
+        except BaseException as e:
+            # e.g. KeyboardInterrupt or SystemExit raised by the embedding function, the thread ends here
+            with self._lock:
+                self._error = e
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[1].set_exception(e)
+            raise
+
+    def _batch(self) -> None:
+        while (item := self._queue.get()) is not None:
+            pending = [item]
+            size = len(item[0])
+            deadline = time.monotonic() + self._max_wait
+            while size < self._max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._embed(pending)
+                    return
+                pending.append(item)
+                size += len(item[0])
+            self._embed(pending)
+
+    def _embed(self, pending: List[_Request]) -> None:
+        documents = [document for batch, _ in pending for document in batch]
+        try:
+            embeddings = np.asarray(
+                self._embedding_function(documents), dtype=np.float32
+            )
+        except BaseException as e:
+            for _, future in pending:
+                future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        offset = 0
+        for batch, future in pending:
+            # every request gets a view of its rows, nothing is copied
+            future.set_result(embeddings[offset : offset + len(batch)])
+            offset += len(batch)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
@@ -1,6 +1,13 @@
 import os
+from functools import partial
 from typing import Any, Dict, Optional, List
 
+from chromadbx.core.instrumentation import instrumented
+from chromadbx.core.ratelimit import (
+    RateLimiter,
+    RetryPolicy,
+    call_with_retry,
+)
 from chromadbx.reranking import (
     Queries,
     RankedResults,
@@ -25,6 +32,8 @@ class CohereReranker(RerankingFunction[Rerankable, RankedResults]):
         timeout: Optional[int] = 60,
         max_retries: Optional[int] = 3,
         additional_headers: Optional[Dict[str, Any]] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
     ):
         """
         Initialize the CohereReranker.
@@ -38,6 +47,8 @@ class CohereReranker(RerankingFunction[Rerankable, RankedResults]):
             timeout: The timeout for the Cohere API request. Defaults to `60`.
             max_retries: The maximum number of retries for the Cohere API request. Defaults to `3`.
             additional_headers: Additional headers to include in the Cohere API request. Defaults to `None`.
+            rate_limiter: The rate limiter to wait for before every request, can be shared with other rerankers and embedding functions. Defaults to `None`.
+            retry_policy: How to retry requests that failed with a retryable error (e.g. 429). Replaces the retries of the Cohere client when given. Defaults to `None`.
         """
         try:
             import cohere
@@ -57,11 +68,14 @@ class CohereReranker(RerankingFunction[Rerankable, RankedResults]):
         self._client = cohere.ClientV2(api_key)
         self._model_name = model_name
         self._top_n = top_n
+        self._rate_limiter = rate_limiter
+        self._retry_policy = retry_policy
         self._raw_scores = raw_scores
         self._max_tokens_per_document = max_tokens_per_document
         self._request_options = RequestOptions(
             timeout_in_seconds=timeout,
-            max_retries=max_retries,
+            # the retry policy replaces the client's own retries instead of compounding them
+            max_retries=0 if retry_policy is not None else max_retries,
             additional_headers=additional_headers,
         )
 
@@ -130,17 +144,26 @@ class CohereReranker(RerankingFunction[Rerankable, RankedResults]):
         else:
             raise ValueError("Invalid rerankables type")
 
+    @instrumented("rerank")
     def __call__(self, queries: Queries, rerankables: Rerankable) -> RankedResults:
         query_documents_tuples = get_query_documents_tuples(queries, rerankables)
         results = []
         for query, documents in query_documents_tuples:
-            response = self._client.rerank(
-                model=self._model_name,
-                query=query,
-                documents=documents,
-                top_n=self._top_n or len(documents),
-                max_tokens_per_doc=self._max_tokens_per_document,
-                request_options=self._request_options,
+            response = call_with_retry(
+                partial(self._rerank, query, documents),
+                retry_policy=self._retry_policy,
+                rate_limiter=self._rate_limiter,
+                input=[query, *documents],
             )
             results.append(response)
         return self._combine_reranked_results(results, rerankables)
+
+    def _rerank(self, query: str, documents: List[str]) -> Any:
+        return self._client.rerank(
+            model=self._model_name,
+            query=query,
+            documents=documents,
+            top_n=self._top_n or len(documents),
+            max_tokens_per_doc=self._max_tokens_per_document,
+            request_options=self._request_options,
+        )
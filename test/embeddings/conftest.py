@@ -0,0 +1,34 @@
+import threading
+import time
+from typing import Any, Dict, List
+
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+
+class CountingEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
+    """
+    A deterministic fake embedding function that records the documents of every call.
+    Documents named "fail" raise a ValueError.
+    """
+
+    def __init__(
+        self, model_name: str = "model", api_key: str = "secret", delay: float = 0.0
+    ) -> None:
+        self._model_name = model_name
+        self._api_key = api_key
+        self._delay = delay
+        self._lock = threading.Lock()
+        self.calls: List[List[str]] = []
+
+    def model_identity(self) -> Dict[str, Any]:
+        return {"model_name": self._model_name}
+
+    def __call__(self, input: Documents) -> Embeddings:
+        if "fail" in input:
+            raise ValueError("Cannot embed")
+        with self._lock:
+            self.calls.append(list(input))
+        if self._delay:
+            time.sleep(self._delay)
+        offset = 0.0 if self._model_name == "model" else 1.0
+        return [[float(len(doc)) + offset, float(sum(map(ord, doc)))] for doc in input]
@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pytest
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from chromadbx.embeddings.cache import CachedEmbeddingFunction
+from chromadbx.embeddings.utils import model_identity
+from test.embeddings.conftest import CountingEmbeddings
+
+
+def test_cache_memory() -> None:
+    ef = CountingEmbeddings()
+    cached = CachedEmbeddingFunction(ef)
+    docs = ["a", "bb", "a", "ccc"]
+    first = cached(docs)
+    assert ef.calls == [["a", "bb", "ccc"]]
+    assert np.allclose(np.array(first), np.array(ef(docs)))
+    second = cached(["ccc", "dddd", "bb"])
+    assert ef.calls[-1] == ["dddd"]
+    assert np.allclose(np.array(second), np.array(ef(["ccc", "dddd", "bb"])))
+    assert cached.stats["hits"] == 2
+    assert cached.stats["misses"] == 4
+    assert cached.stats["memory_hits"] == 2
+    cached.reset_stats()
+    assert cached.stats["hits"] == 0
+
+
+def test_cache_disk(tmp_path: str) -> None:
+    cache_path = os.path.join(tmp_path, "cache.sqlite")
+    ef = CountingEmbeddings()
+    CachedEmbeddingFunction(ef, cache_path=cache_path)(["a", "bb"])
+    cached = CachedEmbeddingFunction(ef, cache_path=cache_path)
+    embeddings = cached(["bb", "a", "ccc"])
+    assert ef.calls[-1] == ["ccc"]
+    assert np.allclose(np.array(embeddings), np.array(ef(["bb", "a", "ccc"])))
+    assert cached.stats["disk_hits"] == 2
+    cached.close()
+
+
+def test_cache_model_identity(tmp_path: str) -> None:
+    cache_path = os.path.join(tmp_path, "cache.sqlite")
+    CachedEmbeddingFunction(CountingEmbeddings(), cache_path=cache_path)(["a"])
+    other = CountingEmbeddings(model_name="other")
+    CachedEmbeddingFunction(other, cache_path=cache_path)(["a"])
+    assert other.calls == [["a"]]
+    assert "secret" not in model_identity(other)
+    assert model_identity(CountingEmbeddings(api_key="x")) == model_identity(
+        CountingEmbeddings(api_key="y")
+    )
+
+
+def test_cache_model_identity_changes() -> None:
+    ef = CountingEmbeddings()
+    cached = CachedEmbeddingFunction(ef)
+    cached(["a"])
+    # e.g. a reloaded model
+    ef._model_name = "other"
+    cached(["a"])
+    assert ef.calls == [["a"], ["a"]]
+
+
+def test_cache_without_model_identity() -> None:
+    class AnonymousEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
+        def __call__(self, input: Documents) -> Embeddings:
+            return [[1.0] for _ in input]
+
+    with pytest.raises(ValueError, match="pass model_id"):
+        CachedEmbeddingFunction(AnonymousEmbeddings())
+    cached = CachedEmbeddingFunction(AnonymousEmbeddings(), model_id="anonymous")
+    assert cached(["a"]) == [[1.0]]
+
+
+def test_cache_remote_model_identity() -> None:
+    from chromadbx.core.ratelimit import RateLimiter
+    from chromadbx.embeddings.nomic import NomicEmbeddingFunction
+
+    assert model_identity(
+        NomicEmbeddingFunction(api_key="a", max_tokens_per_text=512)
+    ) != model_identity(NomicEmbeddingFunction(api_key="a", max_tokens_per_text=1024))
+    # neither the API key nor the client configuration are part of the identity
+    assert model_identity(NomicEmbeddingFunction(api_key="a")) == model_identity(
+        NomicEmbeddingFunction(
+            api_key="b", rate_limiter=RateLimiter(requests_per_second=1), timeout=10
+        )
+    )
+
+
+def test_cache_empty_input() -> None:
+    ef = CountingEmbeddings()
+    cached = CachedEmbeddingFunction(ef, return_numpy=True)
+    # chromadb's wrapper of __call__ rejects empty embeddings
+    with pytest.raises(ValueError, match="non-empty"):
+        cached([])
+    assert ef.calls == []
+
+
+def test_cache_lru() -> None:
+    ef = CountingEmbeddings()
+    cached = CachedEmbeddingFunction(ef, max_memory_items=2, return_numpy=True)
+    cached(["a", "b", "c"])
+    cached(["a"])
+    assert ef.calls[-1] == ["a"]
+    with pytest.raises(ValueError, match="must not be negative"):
+        CachedEmbeddingFunction(ef, max_memory_items=-1)
@@ -1,4 +1,9 @@
+import asyncio
+import json
 import os
+from typing import List
+
+from chromadb.api.types import Embeddings
 
 import pytest
 
@@ -42,9 +47,13 @@ def test_cf_ef_gateway() -> None:
     reason="CF_API_TOKEN and CF_ACCOUNT_ID not set, skipping test.",
 )
 def test_cf_ef_large_batch() -> None:
-    ef = CloudflareWorkersAIEmbeddings(api_token="dummy", account_id="dummy")
-    with pytest.raises(ValueError, match="Batch too large"):
-        ef(["test doc"] * 101)
+    ef = CloudflareWorkersAIEmbeddings(
+        api_token=os.environ.get("CF_API_TOKEN", ""),
+        account_id=os.environ.get("CF_ACCOUNT_ID"),
+    )
+    # inputs larger than max_batch_size are split into several requests
+    embeddings = ef([f"test doc {i}" for i in range(101)])
+    assert len(embeddings) == 101
 
 
 @pytest.mark.skipif(
@@ -70,3 +79,69 @@ def test_cf_ef_with_account_or_gateway() -> None:
         CloudflareWorkersAIEmbeddings(
             api_token="dummy", account_id="dummy", gateway_endpoint="dummy"
         )
+
+
+@pytest.mark.skipif(
+    "CF_API_TOKEN" not in os.environ,
+    reason="CF_API_TOKEN and CF_ACCOUNT_ID not set, skipping test.",
+)
+def test_cf_ef_aembed() -> None:
+    ef = CloudflareWorkersAIEmbeddings(
+        api_token=os.environ.get("CF_API_TOKEN", ""),
+        account_id=os.environ.get("CF_ACCOUNT_ID"),
+        max_concurrency=2,
+    )
+
+    async def embed_all() -> List[Embeddings]:
+        return await asyncio.gather(*[ef.aembed(["test doc"]) for _ in range(4)])
+
+    results = asyncio.run(embed_all())
+    assert len(results) == 4
+    assert all(len(embeddings) == 1 for embeddings in results)
+
+
+def test_cf_ef_shared_transport() -> None:
+    httpx = pytest.importorskip("httpx", reason="httpx not installed")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        texts = json.loads(request.content)["text"]
+        return httpx.Response(
+            200, json={"result": {"data": [[float(len(t))] for t in texts]}}
+        )
+
+    async def handler_async(request: httpx.Request) -> httpx.Response:
+        return handler(request)
+
+    ef = CloudflareWorkersAIEmbeddings(
+        api_token="token",
+        account_id="account",
+        max_batch_size=2,
+        transport=httpx.MockTransport(handler),
+        async_transport=httpx.MockTransport(handler_async),
+    )
+    assert [e[0] for e in ef(["a", "bb", "ccc"])] == [1.0, 2.0, 3.0]
+    assert [e[0] for e in asyncio.run(ef.aembed(["a", "bb", "ccc"]))] == [
+        1.0,
+        2.0,
+        3.0,
+    ]
+
+
+def test_cf_ef_aembed_multiple_event_loops() -> None:
+    httpx = pytest.importorskip("httpx", reason="httpx not installed")
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.01)
+        texts = json.loads(request.content)["text"]
+        return httpx.Response(200, json={"result": {"data": [[1.0]] * len(texts)}})
+
+    ef = CloudflareWorkersAIEmbeddings(
+        api_token="token",
+        account_id="account",
+        max_batch_size=1,
+        max_concurrency=1,
+        async_transport=httpx.MockTransport(handler),
+    )
+    # every asyncio.run() creates and closes a new event loop
+    assert len(asyncio.run(ef.aembed(["a", "b", "c"]))) == 3
+    assert len(asyncio.run(ef.aembed(["a", "b", "c"]))) == 3
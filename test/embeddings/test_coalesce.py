@@ -0,0 +1,75 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from chromadbx.embeddings.coalesce import CoalescingEmbeddingFunction
+from test.embeddings.conftest import CountingEmbeddings
+
+
+def test_coalescing_embeddings() -> None:
+    ef = CountingEmbeddings(delay=0.01)
+    queries = [f"query {i}" for i in range(200)]
+    with CoalescingEmbeddingFunction(
+        ef, max_batch_size=32, max_wait=0.05
+    ) as coalescing:
+        with ThreadPoolExecutor(max_workers=64) as executor:
+            embeddings = list(executor.map(lambda q: coalescing([q]), queries))
+    batched_calls = list(ef.calls)
+    for query, embedding in zip(queries, embeddings):
+        assert np.allclose(embedding, ef([query]))
+    assert len(batched_calls) < len(queries)
+    assert max(len(call) for call in batched_calls) <= 32
+
+
+def test_coalescing_embeddings_max_wait() -> None:
+    ef = CountingEmbeddings()
+    with CoalescingEmbeddingFunction(
+        ef, max_batch_size=32, max_wait=0.01
+    ) as coalescing:
+        start = time.monotonic()
+        embeddings = coalescing(["lonely query"])
+        assert time.monotonic() - start < 0.5
+    assert len(embeddings) == 1
+    assert ef.calls == [["lonely query"]]
+
+
+def test_coalescing_embeddings_full_batch() -> None:
+    ef = CountingEmbeddings()
+    with CoalescingEmbeddingFunction(
+        ef, max_batch_size=2, return_numpy=True
+    ) as coalescing:
+        embeddings = coalescing(["a", "b", "c"])
+    assert len(embeddings) == 3
+    assert all(embedding.dtype == np.float32 for embedding in embeddings)
+    assert ef.calls == [["a", "b", "c"]]
+
+
+def test_coalescing_embeddings_error() -> None:
+    class FailingEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
+        def __call__(self, input: Documents) -> Embeddings:
+            raise RuntimeError("model failed")
+
+    coalescing = CoalescingEmbeddingFunction(FailingEmbeddings())
+    with pytest.raises(RuntimeError, match="model failed"):
+        coalescing(["query"])
+    coalescing.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        coalescing(["query"])
+
+
+# the exception is re-raised in the batching thread after failing the pending calls
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_coalescing_embeddings_base_exception() -> None:
+    class ExitingEmbeddings(EmbeddingFunction[Documents]):  # type: ignore[misc]
+        def __call__(self, input: Documents) -> Embeddings:
+            raise SystemExit("model exited")
+
+    coalescing = CoalescingEmbeddingFunction(ExitingEmbeddings())
+    # the pending call fails instead of waiting forever for the dead batching thread
+    with pytest.raises(SystemExit, match="model exited"):
+        coalescing(["query"])
+    with pytest.raises(RuntimeError, match="coalescer stopped"):
+        coalescing(["query"])
+    coalescing.close()
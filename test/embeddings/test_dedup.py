@@ -0,0 +1,27 @@
+import numpy as np
+
+from chromadbx.embeddings.dedup import DeduplicatingEmbeddingFunction, deduplicate
+from test.embeddings.conftest import CountingEmbeddings
+
+
+def test_deduplicate() -> None:
+    unique, inverse = deduplicate(["a", "b", "a", "c", "b"])
+    assert unique == ["a", "b", "c"]
+    assert inverse == [0, 1, 0, 2, 1]
+
+
+def test_dedup_embeddings() -> None:
+    ef = CountingEmbeddings()
+    dedup = DeduplicatingEmbeddingFunction(ef)
+    docs = ["boilerplate", "a", "boilerplate", "b", "boilerplate"]
+    embeddings = dedup(docs)
+    assert ef.calls == [["boilerplate", "a", "b"]]
+    assert np.allclose(np.array(embeddings), np.array(ef(docs)))
+    # duplicates share the embedding of the unique document
+    assert embeddings[0] is embeddings[2]
+
+
+def test_dedup_embeddings_unique() -> None:
+    ef = CountingEmbeddings()
+    assert len(DeduplicatingEmbeddingFunction(ef)(["a", "b"])) == 2
+    assert ef.calls == [["a", "b"]]
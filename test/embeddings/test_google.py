@@ -1,3 +1,4 @@
+import asyncio
 import os
 import pytest
 from chromadbx.embeddings.google import GoogleVertexAiEmbeddings
@@ -56,3 +57,10 @@ def test_credentials() -> None:
     assert len(embeddings) == 2
     assert len(embeddings[0]) == 256
     assert len(embeddings[1]) == 256
+
+
+def test_aembed() -> None:
+    ef = GoogleVertexAiEmbeddings()
+    embeddings = asyncio.run(ef.aembed(["hello world", "goodbye world"]))
+    assert len(embeddings) == 2
+    assert len(embeddings[0]) == 256
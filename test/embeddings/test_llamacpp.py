@@ -1,4 +1,5 @@
 import os
+import numpy as np
 from chromadbx.embeddings.llamacpp import LlamaCppEmbeddingFunction
 import pytest
 from huggingface_hub import hf_hub_download
@@ -33,3 +34,15 @@ def test_embed_from_hf_model() -> None:
     assert len(embeddings) == 2
     assert len(embeddings[0]) == 384
     assert len(embeddings[1]) == 384
+
+
+def test_embed_return_numpy(get_model: str) -> None:
+    ef = LlamaCppEmbeddingFunction(model_path=get_model, return_numpy=True)
+    embeddings = ef(["hello world", "goodbye world"])
+    assert len(embeddings) == 2
+    # chromadb splits the returned matrix into its rows, every row is a float32 view of that matrix
+    assert isinstance(embeddings, list)
+    assert all(type(e) is np.ndarray and e.dtype == np.float32 for e in embeddings)
+    assert embeddings[0].base is not None
+    assert all(e.base is embeddings[0].base for e in embeddings)
+    assert len(embeddings[0]) == 384
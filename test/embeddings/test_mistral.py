@@ -1,3 +1,4 @@
+import asyncio
 import os
 import pytest
 from chromadbx.embeddings.mistral import MistralAIEmbeddings
@@ -15,3 +16,14 @@ def test_embed() -> None:
     assert len(embeddings) == 2
     assert len(embeddings[0]) == 1024
     assert len(embeddings[1]) == 1024
+
+
+@pytest.mark.skipif(
+    "MISTRAL_API_KEY" not in os.environ,
+    reason="MISTRAL_API_KEY not set, skipping test.",
+)
+def test_aembed() -> None:
+    ef = MistralAIEmbeddings()
+    embeddings = asyncio.run(ef.aembed(["hello world", "goodbye world"]))
+    assert len(embeddings) == 2
+    assert len(embeddings[0]) == 1024
@@ -1,4 +1,8 @@
+import asyncio
 import os
+from typing import List
+
+from chromadb.api.types import Embeddings
 import pytest
 from chromadbx.embeddings.nomic import NomicEmbeddingFunction
 
@@ -39,3 +43,54 @@ def test_dimensionality() -> None:
     assert len(embeddings) == 2
     assert len(embeddings[0]) == 512
     assert len(embeddings[1]) == 512
+
+
+@pytest.mark.skipif(
+    os.getenv("NOMIC_API_KEY") is None,
+    reason="NOMIC_API_KEY environment variable is not set",
+)
+def test_aembed() -> None:
+    ef = NomicEmbeddingFunction(max_concurrency=2)
+
+    async def embed_all() -> List[Embeddings]:
+        return await asyncio.gather(
+            *[ef.aembed(["hello world", "goodbye world"]) for _ in range(4)]
+        )
+
+    results = asyncio.run(embed_all())
+    assert len(results) == 4
+    assert all(len(embeddings) == 2 for embeddings in results)
+    assert len(results[0][0]) == 768
+
+
+def test_nomic_shared_transport() -> None:
+    requests: List[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.headers["Authorization"])
+        return httpx.Response(200, json={"embeddings": [[0.1, 0.2], [0.3, 0.4]]})
+
+    transport = httpx.MockTransport(handler)
+    ef1 = NomicEmbeddingFunction(api_key="key-1", transport=transport)
+    ef2 = NomicEmbeddingFunction(api_key="key-2", transport=transport)
+    assert len(ef1(["hello world", "goodbye world"])) == 2
+    assert len(ef2(["hello world", "goodbye world"])) == 2
+    assert requests == ["Bearer key-1", "Bearer key-2"]
+
+
+def test_aembed_multiple_event_loops() -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        # yield to the other requests so that they wait for the concurrency limit
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"embeddings": [[0.1, 0.2]]})
+
+    ef = NomicEmbeddingFunction(
+        api_key="key", max_concurrency=1, async_transport=httpx.MockTransport(handler)
+    )
+
+    async def embed_all() -> List[Embeddings]:
+        return await asyncio.gather(*[ef.aembed(["hello world"]) for _ in range(3)])
+
+    # every asyncio.run() creates and closes a new event loop
+    assert len(asyncio.run(embed_all())) == 3
+    assert len(asyncio.run(embed_all())) == 3
@@ -1,5 +1,10 @@
 import os
-from chromadbx.embeddings.onnx import OnnxRuntimeEmbeddings
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List
+import numpy as np
+from chromadbx.embeddings.onnx import OnnxRuntimeEmbeddings, StageRecord, _file_sha256
 import pytest
 from huggingface_hub import hf_hub_download
 
@@ -44,3 +49,387 @@ def test_download_from_hf() -> None:
     embeddings = ef(["hello world", "goodbye world"])
     assert len(embeddings) == 2
     assert len(embeddings[0]) == 384
+
+
+def test_dynamic_padding(get_model: str) -> None:
+    docs = ["hello", "a much longer document " * 20, "goodbye world"] * 20
+    ef = OnnxRuntimeEmbeddings(
+        model_path=get_model, preferred_providers=["CPUExecutionProvider"]
+    )
+    ef_dynamic = OnnxRuntimeEmbeddings(
+        model_path=get_model,
+        preferred_providers=["CPUExecutionProvider"],
+        dynamic_padding=True,
+    )
+    embeddings = np.array(ef(docs))
+    dynamic_embeddings = np.array(ef_dynamic(docs))
+    assert dynamic_embeddings.shape == (60, 384)
+    assert np.allclose(embeddings, dynamic_embeddings, atol=1e-5)
+
+
+def test_parallel_sessions(get_model: str) -> None:
+    docs = ["hello world", "goodbye world", "a longer document " * 10] * 50
+    ef = OnnxRuntimeEmbeddings(
+        model_path=get_model, preferred_providers=["CPUExecutionProvider"]
+    )
+    ef_parallel = OnnxRuntimeEmbeddings(
+        model_path=get_model,
+        preferred_providers=["CPUExecutionProvider"],
+        intra_op_num_threads=1,
+        num_sessions=4,
+    )
+    expected = np.array(ef(docs))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(ef_parallel, [docs] * 8))
+    assert len(ef_parallel._state.sessions) == 4
+    for result in results:
+        assert np.allclose(expected, np.array(result), atol=1e-5)
+
+
+def test_invalid_num_sessions(get_model: str) -> None:
+    with pytest.raises(ValueError, match="Number of sessions must be at least 1"):
+        OnnxRuntimeEmbeddings(model_path=get_model, num_sessions=0)
+
+
+def test_quantized(get_model: str, tmp_path: str) -> None:
+    pytest.importorskip("onnx", reason="onnx not installed")
+    ef = OnnxRuntimeEmbeddings(
+        model_path=get_model,
+        preferred_providers=["CPUExecutionProvider"],
+        quantized=True,
+        model_cache_dir=str(tmp_path),
+    )
+    assert ef._actual_model_path.startswith(str(tmp_path))
+    assert ef._actual_model_path.endswith("_int8.onnx")
+    embeddings = ef(["hello world", "goodbye world"])
+    assert len(embeddings) == 2
+    assert len(embeddings[0]) == 384
+    drift = ef.quantization_drift(["hello world", "goodbye world"])
+    assert drift["mean_similarity"] > 0.9
+    assert drift["min_similarity"] <= drift["mean_similarity"]
+
+
+def test_quantization_drift_with_output_dimensions(
+    get_model: str, tmp_path: str
+) -> None:
+    pytest.importorskip("onnx", reason="onnx not installed")
+    ef = OnnxRuntimeEmbeddings(
+        model_path=get_model,
+        preferred_providers=["CPUExecutionProvider"],
+        model_cache_dir=str(tmp_path),
+        quantized=True,
+        output_dimensions=64,
+    )
+    drift = ef.quantization_drift(["hello world", "goodbye world"])
+    assert drift["mean_similarity"] > 0.9
+    assert drift["min_similarity"] <= drift["mean_similarity"]
+
+
+def test_quantization_drift_requires_quantized(get_model: str) -> None:
+    ef = OnnxRuntimeEmbeddings(model_path=get_model)
+    with pytest.raises(ValueError, match="only be measured for quantized models"):
+        ef.quantization_drift(["hello world"])
+
+
+def test_return_numpy(get_model: str) -> None:
+    ef = OnnxRuntimeEmbeddings(
+        model_path=get_model,
+        preferred_providers=["CPUExecutionProvider"],
+        return_numpy=True,
+    )
+    embeddings = ef(["hello world", "goodbye world"])
+    assert len(embeddings) == 2
+    # chromadb splits the returned matrix into its rows, every row is a float32 view of that matrix
+    assert isinstance(embeddings, list)
+    assert all(type(e) is np.ndarray and e.dtype == np.float32 for e in embeddings)
+    assert embeddings[0].base is not None
+    assert all(e.base is embeddings[0].base for e in embeddings)
+    assert len(embeddings[0]) == 384
+
+
+def test_pipelined(get_model: str) -> None:
+    docs = ["hello world", "goodbye world", "a longer document " * 10] * 50
+    ef = OnnxRuntimeEmbeddings(
+        model_path=get_model, preferred_providers=["CPUExecutionProvider"]
+    )
+    ef_pipelined = OnnxRuntimeEmbeddings(
+        model_path=get_model,
+        preferred_providers=["CPUExecutionProvider"],
+        pipelined=True,
+    )
+    assert np.allclose(np.array(ef(docs)), np.array(ef_pipelined(docs)), atol=1e-5)
+
+
+def test_pipelined_stopped_early(get_model: str) -> None:
+    ef = OnnxRuntimeEmbeddings(model_path=get_model, pipelined=True, batch_size=1)
+    resume = threading.Event()
+
+    def documents() -> Iterator[str]:
+        yield "hello world"
+        # the consumer stops while the inference stage waits for the next batch
+        resume.wait()
+        yield "goodbye world"
+
+    stream = ef.embed_stream(documents())
+    next(stream)
+    stream.close()
+    resume.set()
+    time.sleep(1)
+    stages = [t.name for t in threading.enumerate()]
+    assert "onnx-tokenize" not in stages and "onnx-infer" not in stages
+
+
+def test_file_sha256_cached(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "model.onnx")
+    with open(path, "wb") as f:
+        f.write(b"model")
+    cache_dir = os.path.join(tmp_path, "cache")
+    digest = _file_sha256(path, cache_dir)
+    assert digest == _file_sha256(path)
+    (digest_file,) = os.listdir(os.path.join(cache_dir, "digests"))
+    # the stored digest is used as long as the file is unchanged
+    with open(os.path.join(cache_dir, "digests", digest_file), "w") as f:
+        f.write("0" * 64)
+    assert _file_sha256(path, cache_dir) == "0" * 64
+    with open(path, "wb") as f:
+        f.write(b"new model")
+    assert _file_sha256(path, cache_dir) == _file_sha256(path) != digest
+
+
+def test_cache_optimized_model(get_model: str, tmp_path: str) -> None:
+    for _ in range(2):
+        ef = OnnxRuntimeEmbeddings(
+            model_path=get_model,
+            preferred_providers=["CPUExecutionProvider"],
+            model_cache_dir=str(tmp_path),
+            cache_optimized_model=True,
+        )
+        ef.warmup()
+        assert os.path.exists(ef._optimized_model_path())
+        embeddings = ef(["hello world", "goodbye world"])
+        assert len(embeddings) == 2
+        assert len(embeddings[0]) == 384
+    assert len([f for f in os.listdir(tmp_path) if f.endswith(".onnx")]) == 1
+
+
+def test_io_binding(get_model: str) -> None:
+    docs = ["hello world", "goodbye world", "a longer document " * 10] * 50
+    ef = OnnxRuntimeEmbeddings(
+        model_path=get_model, preferred_providers=["CPUExecutionProvider"]
+    )
+    ef_bound = OnnxRuntimeEmbeddings(
+        model_path=get_model,
+        preferred_providers=["CPUExecutionProvider"],
+        io_binding=True,
+        dynamic_padding=True,
+    )
+    expected = np.array(ef(docs))
+    # the second call reuses the buffers allocated by the first one
+    for _ in range(2):
+        assert np.allclose(expected, np.array(ef_bound(docs)), atol=1e-5)
+
+
+def test_io_binding_with_pipelined(get_model: str) -> None:
+    with pytest.raises(ValueError, match="IO binding cannot be combined"):
+        OnnxRuntimeEmbeddings(model_path=get_model, io_binding=True, pipelined=True)
+
+
+@pytest.mark.parametrize("dynamic_padding", [False, True])
+def test_embed_stream(get_model: str, dynamic_padding: bool) -> None:
+    docs = ["hello world", "goodbye world", "a longer document " * 10] * 50
+    ef = OnnxRuntimeEmbeddings(
+        model_path=get_model,
+        preferred_providers=["CPUExecutionProvider"],
+        dynamic_padding=dynamic_padding,
+    )
+    expected = np.array(ef(docs))
+    offset = 0
+    for chunk_offset, embeddings in ef.embed_stream(iter(docs), batch_size=16):
+        assert chunk_offset == offset
+        assert np.allclose(expected[offset : offset + len(embeddings)], embeddings)
+        offset += len(embeddings)
+    assert offset == len(docs)
+
+
+@pytest.mark.parametrize("return_numpy", [False, True])
+def test_output_dimensions(get_model: str, return_numpy: bool) -> None:
+    ef = OnnxRuntimeEmbeddings(
+        model_path=get_model,
+        preferred_providers=["CPUExecutionProvider"],
+        output_dimensions=128,
+        return_numpy=return_numpy,
+    )
+    embeddings = np.array(ef(["hello world", "goodbye world"]))
+    assert embeddings.shape == (2, 128)
+    assert np.allclose(np.linalg.norm(embeddings, axis=1), 1.0, atol=1e-5)
+
+
+def test_output_dimensions_exceeding_hidden_size(get_model: str) -> None:
+    ef = OnnxRuntimeEmbeddings(model_path=get_model, output_dimensions=1024)
+    with pytest.raises(ValueError, match="exceed the model hidden size"):
+        ef(["hello world"])
+
+
+@pytest.mark.parametrize(
+    "budget",
+    [
+        {"batch_size": 7},
+        {"max_batch_tokens": 2048},
+        {"max_batch_bytes": 2048 * 384 * 4},
+        {"max_batch_tokens": 4096, "target_batch_latency": 0.01},
+    ],
+)
+def test_batch_budget(get_model: str, budget: Dict[str, Any]) -> None:
+    docs = ["hello world", "goodbye world", "a longer document " * 10] * 50
+    ef = OnnxRuntimeEmbeddings(
+        model_path=get_model, preferred_providers=["CPUExecutionProvider"]
+    )
+    ef_budget = OnnxRuntimeEmbeddings(
+        model_path=get_model,
+        preferred_providers=["CPUExecutionProvider"],
+        dynamic_padding=True,
+        **budget,
+    )
+    assert np.allclose(np.array(ef(docs)), np.array(ef_budget(docs)), atol=1e-5)
+    if "max_batch_tokens" in budget:
+        assert ef_budget._batch_budget is not None
+        assert ef_budget._batch_budget.tokens() <= budget["max_batch_tokens"]
+
+
+def test_profiling(get_model: str, tmp_path: str) -> None:
+    records: List[StageRecord] = []
+    ef = OnnxRuntimeEmbeddings(
+        model_path=get_model,
+        preferred_providers=["CPUExecutionProvider"],
+        profiling_callback=records.append,
+        ort_profiling_dir=str(tmp_path),
+    )
+    ef(["hello world", "goodbye world"] * 20)
+    assert ef.stats is not None
+    summary = ef.stats.summary()
+    assert set(summary.keys()) == {"tokenize", "infer", "pool", "convert"}
+    assert summary["infer"]["count"] == 2
+    assert 0 < summary["infer"]["padding_ratio"] < 1
+    assert sum(summary["infer"]["histogram"].values()) == 2
+    assert {r["stage"] for r in records} == set(summary.keys())
+    assert records[0]["batch_shape"] == (32, 256)
+    trace_files = ef.end_ort_profiling()
+    assert len(trace_files) == 1
+    assert os.path.exists(trace_files[0])
+
+
+def test_profiling_disabled(get_model: str) -> None:
+    ef = OnnxRuntimeEmbeddings(model_path=get_model)
+    ef(["hello world"])
+    assert ef.stats is None
+    with pytest.raises(ValueError, match="profiling is not enabled"):
+        ef.end_ort_profiling()
+
+
+def test_reload(get_model: str) -> None:
+    ef = OnnxRuntimeEmbeddings(
+        model_path=get_model, preferred_providers=["CPUExecutionProvider"]
+    )
+    docs = ["hello world", "goodbye world"]
+    embeddings = np.array(ef(docs))
+    initial_version = ef.model_version
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(ef.embed_with_version, docs) for _ in range(8)]
+        assert ef.reload(get_model, version="v2").result(timeout=60) == "v2"
+        for future in futures:
+            version, result = future.result()
+            assert version in (initial_version, "v2")
+            assert np.allclose(embeddings, np.array(result), atol=1e-5)
+    assert ef.model_version == "v2"
+    assert ef.embed_with_version(docs)[0] == "v2"
+
+
+def test_reload_invalid_model(get_model: str) -> None:
+    ef = OnnxRuntimeEmbeddings(model_path=get_model)
+    version = ef.model_version
+    with pytest.raises(ValueError, match="does not exist"):
+        ef.reload("/nonexistent/model").result(timeout=60)
+    assert ef.model_version == version
+
+
+def test_shared_weights(get_model: str, tmp_path: str) -> None:
+    ef = OnnxRuntimeEmbeddings(model_path=get_model)
+    ef_shared = OnnxRuntimeEmbeddings(
+        model_path=get_model, shared_weights=True, model_cache_dir=str(tmp_path)
+    )
+    ef_shared.preload()
+    assert not ef_shared._state.sessions
+    docs = ["hello world", "goodbye world"]
+    assert np.allclose(np.array(ef(docs)), np.array(ef_shared(docs)), atol=1e-5)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork")
+def test_sessions_created_before_fork(get_model: str) -> None:
+    ef = OnnxRuntimeEmbeddings(model_path=get_model)
+    ef(["hello world"])
+    pid = os.fork()
+    if pid == 0:
+        try:
+            ef(["hello world"])
+        except RuntimeError:
+            os._exit(0)
+        os._exit(1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+
+
+def test_shared_weights_with_cache_optimized_model(get_model: str) -> None:
+    with pytest.raises(ValueError, match="Shared weights cannot be combined"):
+        OnnxRuntimeEmbeddings(
+            model_path=get_model, shared_weights=True, cache_optimized_model=True
+        )
+
+
+def test_chunk(get_model: str) -> None:
+    ef = OnnxRuntimeEmbeddings(
+        model_path=get_model, preferred_providers=["CPUExecutionProvider"]
+    )
+    # words of different token lengths, so that fixed-stride chunking would cut words
+    words = [
+        f"word{i}" if i % 3 else "antidisestablishmentarianism" for i in range(200)
+    ]
+    document = " ".join(words)
+    chunks = ef.chunk([document, "short document"], ids=["a", "b"], chunk_size=64)
+    assert len(chunks["ids"]) == len(chunks["documents"]) == len(chunks["embeddings"])
+    assert chunks["ids"][0] == "a-0"
+    assert chunks["ids"][-1] == "b-0"
+    for text, metadata in zip(chunks["documents"], chunks["metadatas"]):
+        source = document if metadata["document_id"] == "a" else "short document"
+        assert source[metadata["start"] : metadata["end"]] == text
+        # chunks start and end at word boundaries
+        assert set(text.split()) <= set(words) | {"short", "document"}
+    # consecutive chunks of a document overlap
+    assert chunks["metadatas"][1]["start"] < chunks["metadatas"][0]["end"]
+    ef_chunk_size = OnnxRuntimeEmbeddings(
+        model_path=get_model,
+        preferred_providers=["CPUExecutionProvider"],
+        max_length=64,
+    )
+    assert np.allclose(
+        np.array(chunks["embeddings"]),
+        np.array(ef_chunk_size(chunks["documents"])),
+        atol=1e-5,
+    )
+
+
+def test_chunk_duplicates_and_empty_documents(get_model: str) -> None:
+    ef = OnnxRuntimeEmbeddings(model_path=get_model)
+    chunks = ef.chunk(["hello world", "", "hello world"])
+    assert len(chunks["ids"]) == len(set(chunks["ids"])) == 2
+    assert ef.chunk(["", ""]) == {
+        "ids": [],
+        "documents": [],
+        "embeddings": [],
+        "metadatas": [],
+    }
+
+
+def test_chunk_invalid_overlap(get_model: str) -> None:
+    ef = OnnxRuntimeEmbeddings(model_path=get_model)
+    with pytest.raises(ValueError, match="Overlap must be between"):
+        ef.chunk(["hello world"], chunk_size=16, overlap=16)
@@ -0,0 +1,53 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Generator
+
+import numpy as np
+import pytest
+
+from chromadbx.embeddings.serve import EmbeddingServer, EmbeddingServerClient
+from test.embeddings.conftest import CountingEmbeddings
+
+
+@pytest.fixture
+def socket_path() -> Generator[str, None, None]:
+    # Unix socket paths are limited to ~100 characters, pytest's tmp_path may be longer
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        yield os.path.join(tmp_dir, "embeddings.sock")
+
+
+def test_serve(socket_path: str) -> None:
+    ef = CountingEmbeddings()
+    with EmbeddingServer(ef, socket_path, max_wait=0.05):
+        client = EmbeddingServerClient(socket_path)
+        docs = [[f"document {i}", f"another document {i}"] for i in range(32)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(client, docs))
+        for batch, embeddings in zip(docs, results):
+            assert np.allclose(np.array(embeddings), np.array(ef(batch)))
+    # requests from concurrent clients are coalesced into fewer batches
+    assert len(ef.calls) - len(docs) < len(docs)
+
+
+def test_serve_return_numpy(socket_path: str) -> None:
+    with EmbeddingServer(CountingEmbeddings(), socket_path):
+        client = EmbeddingServerClient(socket_path, return_numpy=True)
+        small = client(["a"])
+        large = client([f"document {i}" for i in range(100)])
+        assert np.array(small).shape == (1, 2)
+        assert np.array(large).shape == (100, 2)
+
+
+def test_serve_error(socket_path: str) -> None:
+    with EmbeddingServer(CountingEmbeddings(), socket_path):
+        client = EmbeddingServerClient(socket_path)
+        with pytest.raises(ValueError, match="Cannot embed"):
+            client(["fail"])
+        assert len(client(["hello"])) == 1
+
+
+def test_serve_socket_in_use(socket_path: str) -> None:
+    with EmbeddingServer(CountingEmbeddings(), socket_path):
+        with pytest.raises(ValueError, match="already listening"):
+            EmbeddingServer(CountingEmbeddings(), socket_path)
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 from chromadbx.embeddings.spacy import SpacyEmbeddingFunction
 import subprocess
 
@@ -35,3 +36,58 @@ def test_spacy_with_invalid_model() -> None:
     with pytest.raises(ValueError) as e:
         SpacyEmbeddingFunction(model_name="invalid_model")
     assert "spacy model 'invalid_model' are not downloaded yet" in str(e.value)
+
+
+def test_spacy_empty_input() -> None:
+    download_model("en_core_web_sm")
+    ef = SpacyEmbeddingFunction(model_name="en_core_web_sm")
+    # chromadb's wrapper of __call__ rejects empty embeddings
+    with pytest.raises(ValueError, match="non-empty"):
+        ef([])
+
+
+def test_spacy_return_numpy() -> None:
+    download_model("en_core_web_sm")
+    ef = SpacyEmbeddingFunction(model_name="en_core_web_sm", return_numpy=True)
+    embeddings = ef(["hello world", "goodbye world"])
+    assert len(embeddings) == 2
+    # chromadb splits the returned matrix into its rows, every row is a float32 view of that matrix
+    assert isinstance(embeddings, list)
+    assert all(type(e) is np.ndarray and e.dtype == np.float32 for e in embeddings)
+    assert embeddings[0].base is not None
+    assert all(e.base is embeddings[0].base for e in embeddings)
+    assert len(embeddings[0]) == 96
+
+
+def test_spacy_float32_matrix() -> None:
+    download_model("en_core_web_sm")
+    ef = SpacyEmbeddingFunction(model_name="en_core_web_sm", batch_size=2)
+    embeddings = ef(["hello world", "goodbye world", "hello again"])
+    assert all(e.dtype == np.float32 for e in embeddings)
+    assert len(embeddings) == 3
+
+
+def test_spacy_n_process() -> None:
+    download_model("en_core_web_sm")
+    texts = ["hello world", "goodbye world"] * 50
+    expected = SpacyEmbeddingFunction(model_name="en_core_web_sm")(texts)
+    ef = SpacyEmbeddingFunction(model_name="en_core_web_sm", n_process=2, batch_size=10)
+    assert np.allclose(ef(texts), expected)
+
+
+def test_spacy_vectors_only() -> None:
+    download_model("en_core_web_lg")
+    texts = ["hello world", "goodbye world", "", "an unknownwordxyz here"]
+    expected = SpacyEmbeddingFunction()(texts)
+    ef = SpacyEmbeddingFunction(vectors_only=True, batch_size=3)
+    embeddings = ef(texts)
+    assert len(embeddings) == 4
+    assert all(e.dtype == np.float32 for e in embeddings)
+    assert np.allclose(embeddings, expected, atol=1e-5)
+
+
+def test_spacy_vectors_only_without_vectors() -> None:
+    download_model("en_core_web_sm")
+    with pytest.raises(ValueError) as e:
+        SpacyEmbeddingFunction(model_name="en_core_web_sm", vectors_only=True)
+    assert "has no static vectors table" in str(e.value)
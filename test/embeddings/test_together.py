@@ -1,3 +1,4 @@
+import asyncio
 import os
 import pytest
 from chromadbx.embeddings.together import TogetherEmbeddingFunction
@@ -16,3 +17,14 @@ def test_together() -> None:
     assert embeddings is not None
     assert len(embeddings) == 2
     assert len(embeddings[0]) == 768
+
+
+@pytest.mark.skipif(
+    os.getenv("TOGETHER_API_KEY") is None,
+    reason="TOGETHER_API_KEY environment variable is not set",
+)
+def test_together_aembed() -> None:
+    ef = TogetherEmbeddingFunction(api_key=os.getenv("TOGETHER_API_KEY", ""))
+    embeddings = asyncio.run(ef.aembed(["hello world", "goodbye world"]))
+    assert len(embeddings) == 2
+    assert len(embeddings[0]) == 768
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+from typing import List
+
+import pytest
+from chromadb.api.types import Documents, Embeddings
+
+from chromadbx.embeddings.utils import (
+    Batcher,
+    HTTPClientOptions,
+    LoopLocal,
+    check_numpy_embeddings,
+    create_transport,
+    split_batches,
+)
+
+
+def test_split_batches() -> None:
+    docs = [f"doc {i}" for i in range(10)]
+    assert [len(b) for b in split_batches(docs, max_batch_size=4)] == [4, 4, 2]
+    # every "doc i" is estimated as 2 tokens
+    assert [len(b) for b in split_batches(docs, max_batch_tokens=6)] == [3, 3, 3, 1]
+    assert split_batches(["a" * 100, "b"], max_batch_tokens=5) == [["a" * 100], ["b"]]
+    assert split_batches(docs) == [docs]
+
+
+def test_batcher() -> None:
+    batches: List[int] = []
+    lock = threading.Lock()
+
+    def embed(batch: Documents) -> Embeddings:
+        with lock:
+            batches.append(len(batch))
+        return [[float(doc.split()[1])] for doc in batch]
+
+    docs = [f"doc {i}" for i in range(1050)]
+    embeddings = Batcher(max_batch_size=100, parallelism=8)(embed, docs)
+    assert [e[0] for e in embeddings] == list(range(1050))
+    assert sorted(batches) == [50] + [100] * 10
+
+
+def test_batcher_async() -> None:
+    async def embed(batch: Documents) -> Embeddings:
+        await asyncio.sleep(0.01)
+        return [[float(doc.split()[1])] for doc in batch]
+
+    docs = [f"doc {i}" for i in range(250)]
+    embeddings = asyncio.run(Batcher(max_batch_size=16).acall(embed, docs))
+    assert [e[0] for e in embeddings] == list(range(250))
+
+
+def test_batcher_invalid() -> None:
+    with pytest.raises(ValueError, match="Parallelism must be at least 1"):
+        Batcher(parallelism=0)
+
+
+def test_loop_local() -> None:
+    local: LoopLocal[object] = LoopLocal(object)
+
+    async def get() -> object:
+        assert local.get() is local.get()
+        return local.get()
+
+    first = asyncio.run(get())
+    assert asyncio.run(get()) is not first
+    # the value of the closed loop was dropped
+    assert len(local._values) == 1
+    with pytest.raises(RuntimeError):
+        local.get()
+
+
+def test_http_client_options() -> None:
+    httpx = pytest.importorskip("httpx", reason="httpx not installed")
+    options = HTTPClientOptions(
+        headers={"Authorization": "Bearer key"},
+        timeout=10.0,
+        max_connections=8,
+        max_keepalive_connections=4,
+        keepalive_expiry=30.0,
+    )
+    client = options.client()
+    assert client.headers["Authorization"] == "Bearer key"
+    assert client.timeout.read == 10.0
+    pool = client._transport._pool  # type: ignore[attr-defined]
+    assert pool._max_connections == 8
+    assert pool._max_keepalive_connections == 4
+    assert pool._keepalive_expiry == 30.0
+
+    transport = create_transport(max_connections=2)
+    shared = HTTPClientOptions(headers={}, transport=transport)
+    assert shared.client()._transport is transport
+    assert isinstance(options.async_client(), httpx.AsyncClient)
+
+
+def test_http2_requires_h2() -> None:
+    try:
+        import h2  # noqa: F401
+
+        pytest.skip("h2 is installed")
+    except ImportError:
+        pass
+    with pytest.raises(ValueError, match="pip install httpx\\[http2\\]"):
+        HTTPClientOptions(headers={}, http2=True)
+    with pytest.raises(ValueError, match="pip install httpx\\[http2\\]"):
+        create_transport(http2=True)
+
+
+def test_check_numpy_embeddings(monkeypatch: pytest.MonkeyPatch) -> None:
+    from chromadb.api import types
+
+    check_numpy_embeddings(False)
+    if hasattr(types, "normalize_embeddings"):
+        check_numpy_embeddings(True)
+        # chromadb before 0.5.11
+        monkeypatch.delattr(types, "normalize_embeddings")
+    with pytest.raises(ValueError, match="requires chromadb 0.5.11"):
+        check_numpy_embeddings(True)
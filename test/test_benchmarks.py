@@ -0,0 +1,49 @@
+import argparse
+
+import pytest
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.run import _parse_args, run_benchmark
+from benchmarks.stubs import StubConfig, StubServer
+
+
+def test_generate_corpus() -> None:
+    corpus = generate_corpus("queries", 10)
+    assert len(corpus) == 10
+    assert corpus == generate_corpus("queries", 10)
+    assert corpus != generate_corpus("queries", 10, seed=1)
+    with pytest.raises(ValueError, match="Unknown corpus"):
+        generate_corpus("tweets", 10)
+
+
+@pytest.mark.parametrize("name", ["nomic", "cloudflare"])
+def test_run_benchmark(name: str) -> None:
+    args: argparse.Namespace = _parse_args(
+        ["--num-docs", "20", "--batch-size", "8", "--dimensions", "16"]
+    )
+    with StubServer(StubConfig(error_rate=0.5)) as server:
+        result = run_benchmark(name, args, server.url)
+        assert server.errors > 0
+    assert result["docs"] == 20
+    assert result["failed_calls"] == 0
+    assert result["docs_per_sec"] > 0
+    assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"]
+    assert result["peak_rss_mb"] > 0
+
+
+def test_run_benchmark_warmup_errors() -> None:
+    args: argparse.Namespace = _parse_args(
+        ["--num-docs", "8", "--batch-size", "4", "--dimensions", "16"]
+    )
+    with StubServer(StubConfig(error_rate=1.0)) as server:
+        result = run_benchmark("nomic", args, server.url)
+    # the failed warmup call is counted instead of aborting the run
+    assert result["warmup_failed_calls"] == 1
+    assert result["failed_calls"] == 2
+    assert result["docs"] == 0
+    assert result["errors"]
+
+
+def test_run_benchmark_skipped() -> None:
+    result = run_benchmark("llamacpp", _parse_args([]), "")
+    assert "skipped" in result
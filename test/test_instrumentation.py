@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Generator, List, Optional
+
+import httpx
+import pytest
+
+from chromadbx.core.instrumentation import (
+    Instrumentation,
+    InstrumentationEvent,
+    LoggingInstrumentation,
+    OpenTelemetryInstrumentation,
+    get_instrumentation,
+    instrument,
+    set_instrumentation,
+)
+from chromadbx.core.ratelimit import RetryPolicy
+from chromadbx.embeddings.cache import CachedEmbeddingFunction
+from chromadbx.embeddings.cloudflare import CloudflareWorkersAIEmbeddings
+from chromadbx.embeddings.nomic import NomicEmbeddingFunction
+
+
+class RecordingInstrumentation(Instrumentation):
+    def __init__(self) -> None:
+        self.started: List[InstrumentationEvent] = []
+        self.ended: List[InstrumentationEvent] = []
+
+    def on_start(self, event: InstrumentationEvent) -> None:
+        self.started.append(event)
+
+    def on_end(self, event: InstrumentationEvent) -> None:
+        self.ended.append(event)
+
+    def find(self, component: str, operation: str) -> List[InstrumentationEvent]:
+        return [
+            e
+            for e in self.ended
+            if e["component"] == component and e["operation"] == operation
+        ]
+
+
+@pytest.fixture
+def recorder() -> Generator[RecordingInstrumentation, None, None]:
+    recorder = RecordingInstrumentation()
+    set_instrumentation(recorder)
+    yield recorder
+    set_instrumentation(None)
+
+
+def _nomic(fail_first: int = 0) -> NomicEmbeddingFunction:
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(1)
+        if len(calls) <= fail_first:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        texts = json.loads(request.content)["texts"]
+        return httpx.Response(200, json={"embeddings": [[1.0, 2.0]] * len(texts)})
+
+    async def handler_async(request: httpx.Request) -> httpx.Response:
+        return handler(request)
+
+    return NomicEmbeddingFunction(
+        api_key="key",
+        transport=httpx.MockTransport(handler),
+        async_transport=httpx.MockTransport(handler_async),
+        retry_policy=RetryPolicy(initial_backoff=0.001),
+    )
+
+
+def test_disabled_by_default() -> None:
+    assert get_instrumentation() is None
+    with instrument("component", "operation", ["text"]) as span:
+        span.set("key", "value")
+    assert len(_nomic()(["hello"])) == 1
+
+
+def test_embed_events(recorder: RecordingInstrumentation) -> None:
+    _nomic(fail_first=2)(["hello", "wörld"])
+    (embed,) = recorder.find("NomicEmbeddingFunction", "embed")
+    (request,) = recorder.find("NomicEmbeddingFunction", "request")
+    assert recorder.started[0] is embed
+    assert embed["items"] == 2
+    assert embed["bytes"] == 11
+    assert embed["tokens"] == 4
+    assert embed["seconds"] >= request["seconds"] > 0
+    assert embed["error"] is None
+    assert request["parent_id"] == embed["id"]
+    assert request["attributes"]["retries"] == 2
+
+
+def test_aembed_events(recorder: RecordingInstrumentation) -> None:
+    asyncio.run(_nomic().aembed(["hello"]))
+    (aembed,) = recorder.find("NomicEmbeddingFunction", "aembed")
+    (request,) = recorder.find("NomicEmbeddingFunction", "request")
+    assert request["parent_id"] == aembed["id"]
+
+
+def test_error_event(recorder: RecordingInstrumentation) -> None:
+    ef = _nomic(fail_first=10)
+    with pytest.raises(httpx.HTTPStatusError):
+        ef(["hello"])
+    (embed,) = recorder.find("NomicEmbeddingFunction", "embed")
+    assert isinstance(embed["error"], httpx.HTTPStatusError)
+    (request,) = recorder.find("NomicEmbeddingFunction", "request")
+    assert request["attributes"]["retries"] == 3
+
+
+def test_split_requests_events(recorder: RecordingInstrumentation) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        texts = json.loads(request.content)["text"]
+        return httpx.Response(200, json={"result": {"data": [[1.0]] * len(texts)}})
+
+    ef = CloudflareWorkersAIEmbeddings(
+        api_token="token",
+        account_id="account",
+        max_batch_size=2,
+        transport=httpx.MockTransport(handler),
+    )
+    ef(["a", "b", "c", "d", "e"])
+    (embed,) = recorder.find("CloudflareWorkersAIEmbeddings", "embed")
+    requests = recorder.find("CloudflareWorkersAIEmbeddings", "request")
+    assert sorted(r["items"] for r in requests) == [1, 2, 2]
+    # the sub-requests run on other threads but belong to the call
+    assert all(r["parent_id"] == embed["id"] for r in requests)
+
+
+def test_cache_events(recorder: RecordingInstrumentation) -> None:
+    cached = CachedEmbeddingFunction(_nomic())
+    cached(["a", "b"])
+    cached(["a", "c"])
+    first, second = recorder.find("CachedEmbeddingFunction", "embed")
+    assert first["attributes"] == {"memory_hits": 0, "disk_hits": 0, "misses": 2}
+    assert second["attributes"] == {"memory_hits": 1, "disk_hits": 0, "misses": 1}
+    assert [e["items"] for e in recorder.find("NomicEmbeddingFunction", "embed")] == [
+        2,
+        1,
+    ]
+
+
+def test_logging_instrumentation(caplog: pytest.LogCaptureFixture) -> None:
+    set_instrumentation(LoggingInstrumentation())
+    try:
+        with caplog.at_level(logging.INFO, logger="chromadbx.instrumentation"):
+            _nomic()(["hello"])
+    finally:
+        set_instrumentation(None)
+    messages = [r.getMessage() for r in caplog.records]
+    assert any(m.startswith("NomicEmbeddingFunction.request ") for m in messages)
+    assert any(
+        m.startswith("NomicEmbeddingFunction.embed ") and "items=1" in m
+        for m in messages
+    )
+
+
+class FakeSpan:
+    def __init__(self, name: str, parent: Optional["FakeSpan"]) -> None:
+        self.name = name
+        self.parent = parent
+        self.attributes: Dict[str, Any] = {}
+        self.exceptions: List[BaseException] = []
+        self.ended = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exception: BaseException) -> None:
+        self.exceptions.append(exception)
+
+    def set_status(self, status: Any) -> None:
+        pass
+
+    def end(self) -> None:
+        self.ended = True
+
+
+class FakeTracer:
+    def __init__(self) -> None:
+        self.spans: List[FakeSpan] = []
+
+    def start_span(
+        self,
+        name: str,
+        context: Optional[Any] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> FakeSpan:
+        span = FakeSpan(name, context)
+        span.attributes.update(attributes or {})
+        self.spans.append(span)
+        return span
+
+
+def test_opentelemetry_instrumentation() -> None:
+    tracer = FakeTracer()
+    set_instrumentation(OpenTelemetryInstrumentation(tracer))
+    try:
+        _nomic(fail_first=1)(["hello"])
+    finally:
+        set_instrumentation(None)
+    embed, request = tracer.spans
+    assert embed.name == "NomicEmbeddingFunction.embed"
+    assert embed.attributes["chromadbx.items"] == 1
+    assert request.name == "NomicEmbeddingFunction.request"
+    assert request.attributes["chromadbx.retries"] == 1
+    assert embed.ended and request.ended
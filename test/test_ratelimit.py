@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+from email.utils import formatdate
+from typing import List
+
+import httpx
+import pytest
+
+from chromadbx.core.ratelimit import (
+    RateLimiter,
+    RetryPolicy,
+    _parse_retry_after,
+    acall_with_retry,
+    call_with_retry,
+)
+
+
+def _status_error(status: int, headers: dict = {}) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://example.com/embed")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+def test_rate_limiter_requests_per_second() -> None:
+    limiter = RateLimiter(requests_per_second=20, burst=1)
+    start = time.monotonic()
+    threads = [
+        threading.Thread(target=lambda: [limiter.acquire() for _ in range(5)])
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 10 requests at 20/s with a burst of one take at least 9 intervals of 50ms
+    assert time.monotonic() - start >= 0.4
+
+
+def test_rate_limiter_tokens_per_minute() -> None:
+    limiter = RateLimiter(tokens_per_minute=600)
+    assert limiter.reserve(600) == 0
+    # the bucket refills at 10 tokens per second
+    assert limiter.reserve(10) == pytest.approx(1.0, abs=0.05)
+
+
+def test_rate_limiter_invalid() -> None:
+    with pytest.raises(ValueError, match="Requests per second must be positive"):
+        RateLimiter(requests_per_second=0)
+    with pytest.raises(ValueError, match="Tokens per minute must be positive"):
+        RateLimiter(tokens_per_minute=-1)
+
+
+def test_parse_retry_after() -> None:
+    assert _parse_retry_after("2") == 2.0
+    assert _parse_retry_after(None) is None
+    assert _parse_retry_after("soon") is None
+    assert _parse_retry_after(formatdate(time.time() + 30, usegmt=True)) == (
+        pytest.approx(30, abs=2)
+    )
+
+
+def test_retry_policy_backoff() -> None:
+    policy = RetryPolicy(initial_backoff=1, max_backoff=5, jitter=False)
+    assert [policy.backoff(attempt) for attempt in range(4)] == [1, 2, 4, 5]
+    assert policy.backoff(0, retry_after=10) == 10
+    jittered = RetryPolicy(initial_backoff=1)
+    assert all(0 <= jittered.backoff(2) <= 4 for _ in range(100))
+
+
+def test_retry_policy_retry_delay() -> None:
+    policy = RetryPolicy(max_retries=2, jitter=False)
+    assert policy.retry_delay(_status_error(429, {"Retry-After": "7"}), 0) == 7
+    assert policy.retry_delay(_status_error(503), 1) == 1.0
+    assert policy.retry_delay(_status_error(503), 2) is None
+    assert policy.retry_delay(_status_error(400), 0) is None
+    assert policy.retry_delay(httpx.ConnectError("refused"), 0) == 0.5
+    assert policy.retry_delay(ValueError("invalid"), 0) is None
+
+
+def test_call_with_retry() -> None:
+    attempts: List[int] = []
+
+    def request() -> str:
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _status_error(429, {"retry-after": "0"})
+        return "ok"
+
+    policy = RetryPolicy(initial_backoff=0.01)
+    assert call_with_retry(request, retry_policy=policy) == "ok"
+    assert len(attempts) == 3
+
+    attempts.clear()
+    with pytest.raises(httpx.HTTPStatusError):
+        call_with_retry(request, retry_policy=RetryPolicy(max_retries=1))
+    assert len(attempts) == 2
+
+
+def test_acall_with_retry() -> None:
+    attempts: List[int] = []
+
+    async def request() -> str:
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise _status_error(502)
+        return "ok"
+
+    result = asyncio.run(
+        acall_with_retry(
+            request,
+            retry_policy=RetryPolicy(initial_backoff=0.01),
+            rate_limiter=RateLimiter(requests_per_second=100),
+        )
+    )
+    assert result == "ok"
+    assert len(attempts) == 2